@@ -8,6 +8,7 @@ import secrets
 import warnings
 from argparse import Namespace
 from collections import Counter, deque, defaultdict
+from itertools import chain
 from collections.abc import Collection, MutableSequence
 from enum import IntEnum, IntFlag
 from typing import (AbstractSet, Any, Callable, ClassVar, Dict, Iterable, Iterator, List, Literal, Mapping, NamedTuple,
@@ -586,24 +587,15 @@ class MultiWorld():
         locations is followed by an empty set, and then a set of all of the
         unreachable locations.
         """
-        state = CollectionState(self)
-        locations = set(self.get_filled_locations())
+        search = _SphereSearch(CollectionState(self), self.get_filled_locations())
 
-        while locations:
-            sphere: Set[Location] = set()
-
-            for location in locations:
-                if location.can_reach(state):
-                    sphere.add(location)
+        while search.remaining:
+            sphere = search.next_sphere()
             yield sphere
             if not sphere:
-                if locations:
-                    yield locations  # unreachable locations
+                yield search.remaining  # unreachable locations
                 break
-
-            for location in sphere:
-                state.collect(location.item, True, location)
-            locations -= sphere
+            search.collect(sphere)
 
     def get_sendable_spheres(self) -> Iterator[Set[Location]]:
         """
@@ -612,7 +604,6 @@ class MultiWorld():
         If there are unreachable locations, the last sphere of reachable locations is followed by an empty set,
         and then a set of all of the unreachable locations.
         """
-        state = CollectionState(self)
         locations: Set[Location] = set()
         events: Set[Location] = set()
         for location in self.get_filled_locations():
@@ -620,33 +611,15 @@ class MultiWorld():
                 locations.add(location)
             else:
                 events.add(location)
+        search = _SphereSearch(CollectionState(self), locations, events)
 
-        while locations:
-            sphere: Set[Location] = set()
-
-            # cull events out
-            done_events: Set[Union[Location, None]] = {None}
-            while done_events:
-                done_events = set()
-                for event in events:
-                    if event.can_reach(state):
-                        state.collect(event.item, True, event)
-                        done_events.add(event)
-                events -= done_events
-
-            for location in locations:
-                if location.can_reach(state):
-                    sphere.add(location)
-
+        while search.remaining:
+            sphere = search.next_sphere()
             yield sphere
             if not sphere:
-                if locations:
-                    yield locations  # unreachable locations
+                yield search.remaining  # unreachable locations
                 break
-
-            for location in sphere:
-                state.collect(location.item, True, location)
-            locations -= sphere
+            search.collect(sphere)
 
     def fulfills_accessibility(self, state: Optional[CollectionState] = None):
         """Check if accessibility rules are fulfilled with current or supplied state."""
@@ -1166,6 +1139,93 @@ class CollectionState():
             self.prog_items[player][item] = count
 
 
+class _SphereSearch:
+    """
+    Splits locations into logical spheres on a CollectionState.
+    Locations are indexed by their parent Region and only tested once it is reachable. After that, they are tested again
+    for every sphere.
+    """
+    state: CollectionState
+    remaining: Set[Location]
+    """Locations that were not found in a sphere yet, excluding events."""
+    events: Set[Location]
+    """Locations that get collected as soon as they are reachable, without becoming part of a sphere."""
+
+    def __init__(self, state: CollectionState, locations: Iterable[Location],
+                 events: Iterable[Location] = ()) -> None:
+        self.state = state
+        self.remaining = set(locations)
+        self.events = set(events)
+        self.players = state.multiworld.player_ids
+        self.location_candidates: Set[Location] = set()
+        self.event_candidates: Set[Location] = set()
+        self.unreached: Set[Location] = set()
+        """locations in reachable regions that were not reachable yet, which are tested again for every sphere"""
+        self.waiting_for_region: Dict[Region, List[Location]] = defaultdict(list)
+        for location in chain(self.remaining, self.events):
+            self.waiting_for_region[location.parent_region].append(location)
+        self.regions: Dict[int, Set[Region]] = {player: set() for player in self.players}
+
+    def next_sphere(self) -> Set[Location]:
+        """
+        Collects all reachable events, then returns all remaining locations that are reachable in the current state.
+        """
+        self._refresh()
+        while self.event_candidates:
+            reached_events = self._test(self.event_candidates)
+            if not reached_events:
+                break
+            for event in reached_events:
+                self.state.collect(event.item, True, event)
+            self.events -= reached_events
+            self._refresh()
+        return self._test(self.location_candidates)
+
+    def collect(self, sphere: Set[Location]) -> None:
+        for location in sphere:
+            self.state.collect(location.item, True, location)
+        self.remaining -= sphere
+
+    def _enqueue(self, locations: Iterable[Location]) -> None:
+        for location in locations:
+            if location in self.remaining:
+                self.location_candidates.add(location)
+            elif location in self.events:
+                self.event_candidates.add(location)
+
+    def _refresh(self) -> None:
+        """Queues the locations that need testing because of changes to the state since the last refresh."""
+        state = self.state
+        waiting_for_region = self.waiting_for_region
+        for player in self.players:
+            if state.stale[player]:
+                state.update_reachable_regions(player)
+            reachable_regions = state.reachable_regions[player]
+            previous_regions = self.regions[player]
+            if len(reachable_regions) != len(previous_regions):
+                for region in reachable_regions - previous_regions:
+                    locations = waiting_for_region.pop(region, None)
+                    if locations:
+                        self._enqueue(locations)
+                self.regions[player] = set(reachable_regions)
+
+        if self.unreached:
+            self._enqueue(self.unreached)
+            self.unreached.clear()
+
+    def _test(self, candidates: Set[Location]) -> Set[Location]:
+        """Tests and clears candidates, returning the reachable ones."""
+        state = self.state
+        reached: Set[Location] = set()
+        for location in candidates:
+            if location.can_reach(state):
+                reached.add(location)
+            else:
+                self.unreached.add(location)
+        candidates.clear()
+        return reached
+
+
 class EntranceType(IntEnum):
     ONE_WAY = 1
     TWO_WAY = 2
@@ -1696,19 +1756,16 @@ class Spoiler:
         state_cache: List[Optional[CollectionState]] = [None]
         collection_spheres: List[Set[Location]] = []
         state = CollectionState(multiworld)
-        sphere_candidates = set(prog_locations)
+        search = _SphereSearch(state, prog_locations)
+        sphere_candidates = search.remaining
         logging.debug('Building up collection spheres.')
         while sphere_candidates:
 
             # build up spheres of collection radius.
             # Everything in each sphere is independent from each other in dependencies and only depends on lower spheres
 
-            sphere = {location for location in sphere_candidates if state.can_reach(location)}
-
-            for location in sphere:
-                state.collect(location.item, True, location)
-
-            sphere_candidates -= sphere
+            sphere = search.next_sphere()
+            search.collect(sphere)
             collection_spheres.append(sphere)
             state_cache.append(state.copy())
 
@@ -1769,21 +1826,18 @@ class Spoiler:
         # used to access it was deemed not required.) So we need to do one final sphere collection pass
         # to build up the correct spheres
 
-        required_locations = {item for sphere in collection_spheres for item in sphere}
         state = CollectionState(multiworld)
+        search = _SphereSearch(state, (location for sphere in collection_spheres for location in sphere))
+        required_locations = search.remaining
         collection_spheres = []
         while required_locations:
-            sphere = set(filter(state.can_reach, required_locations))
-
-            for location in sphere:
-                state.collect(location.item, True, location)
-
+            sphere = search.next_sphere()
+            search.collect(sphere)
             collection_spheres.append(sphere)
 
             logging.debug('Calculated final sphere %i, containing %i of %i progress items.', len(collection_spheres),
-                          len(sphere), len(required_locations))
+                          len(sphere), len(required_locations) + len(sphere))
 
-            required_locations -= sphere
             if not sphere:
                 raise RuntimeError(f'Not all required items reachable. Unreachable locations: {required_locations}')
 
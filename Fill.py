@@ -1,10 +1,13 @@
+import bisect
 import collections
+import heapq
 import itertools
 import logging
 import typing
 from collections import Counter, deque
 
-from BaseClasses import CollectionState, Item, Location, LocationProgressType, MultiWorld, PlandoItemBlock
+from BaseClasses import CollectionState, Item, Location, LocationProgressType, MultiWorld, PlandoItemBlock, Region, \
+    _SphereSearch
 from Options import Accessibility
 
 from worlds.AutoWorld import call_all
@@ -33,6 +36,108 @@ def sweep_from_pool(base_state: CollectionState, itempool: typing.Sequence[Item]
     return new_state
 
 
+class _FillLocations:
+    """
+    The unfilled locations of a fill_restrictive call, in their original order, indexed by player and parent region.
+    Locations in regions that the current state can not reach are left out of the candidates, since Location.can_fill
+    can not accept them, so the search for a spot does not have to evaluate their rules for every item.
+    """
+
+    def __init__(self, locations: typing.List[Location]) -> None:
+        self.locations = locations
+        self.position: typing.Dict[Location, int] = {location: i for i, location in enumerate(locations)}
+        self.filled: typing.Set[Location] = set()
+        self.region_locations: typing.Dict[Region, typing.List[Location]] = {}
+        self.reachable_regions: typing.Dict[int, typing.Set[Region]] = {}
+        """player -> indexed regions that were reachable at the last update"""
+        self.candidates: typing.Dict[typing.Optional[int], typing.List[int]] = {None: []}
+        """player, or None for all players -> sorted positions of unfilled locations that the current state allows"""
+        for i, location in enumerate(locations):
+            if type(location).can_fill is Location.can_fill and type(location).can_reach is Location.can_reach \
+                    and location.always_allow is Location.always_allow and location.parent_region \
+                    and type(location.parent_region).can_reach is Region.can_reach:
+                self.region_locations.setdefault(location.parent_region, []).append(location)
+                self.reachable_regions.setdefault(location.parent_region.player, set())
+            else:
+                # can_fill may accept these regardless of their region's reachability, so they always are candidates
+                self.candidates[None].append(i)
+
+    def __len__(self) -> int:
+        return len(self.locations) - len(self.filled)
+
+    def update(self, state: CollectionState) -> None:
+        """Updates the candidates to the regions reachable in state."""
+        added: typing.List[int] = []
+        removed: typing.List[int] = []
+        for player, previous in self.reachable_regions.items():
+            if state.stale[player]:
+                state.update_reachable_regions(player)
+            current = state.reachable_regions[player]
+            if previous == current:
+                continue
+            for region in current - previous:
+                added.extend(self.position[location] for location in self.region_locations.get(region, ()))
+            for region in previous - current:
+                removed.extend(self.position[location] for location in self.region_locations.get(region, ()))
+            self.reachable_regions[player] = set(current)
+        if added:
+            added.sort()
+        if removed:
+            removed.sort()
+        for player, candidates in self.candidates.items():
+            player_added = added if player is None else [i for i in added if self.locations[i].player == player]
+            player_removed = removed if player is None else [i for i in removed if self.locations[i].player == player]
+            if len(player_added) + len(player_removed) < 64:
+                for i in player_removed:
+                    del candidates[bisect.bisect_left(candidates, i)]
+                for i in player_added:
+                    bisect.insort(candidates, i)
+            else:
+                if player_removed:
+                    removed_set = set(player_removed)
+                    candidates = [i for i in candidates if i not in removed_set]
+                self.candidates[player] = list(heapq.merge(candidates, player_added))
+
+    def iter_candidates(self, player: typing.Optional[int] = None, check_access: bool = True
+                        ) -> typing.Iterator[Location]:
+        """Yields the unfilled locations, or only those of player, in their original order."""
+        if not check_access:
+            return (location for location in self.locations
+                    if location not in self.filled and (player is None or location.player == player))
+        candidates = self.candidates.get(player)
+        if candidates is None:
+            candidates = self.candidates[player] = [i for i in self.candidates[None]
+                                                    if self.locations[i].player == player]
+        return (self.locations[i] for i in candidates)
+
+    def fill(self, location: Location) -> None:
+        i = self.position[location]
+        self.filled.add(location)
+        for player in (None, location.player):
+            candidates = self.candidates.get(player)
+            if candidates:
+                index = bisect.bisect_left(candidates, i)
+                if index < len(candidates) and candidates[index] == i:
+                    del candidates[index]
+        region_locations = self.region_locations.get(location.parent_region)
+        if region_locations and location in region_locations:
+            region_locations.remove(location)
+
+    def unfilled(self) -> typing.List[Location]:
+        return [location for location in self.locations if location not in self.filled]
+
+
+def _remove_items(item_pool: typing.List[Item], items: typing.Iterable[Item]) -> None:
+    """Removes items from item_pool in a single pass from its end, where items to place are usually found."""
+    remaining = {id(item) for item in items}
+    for i in range(len(item_pool) - 1, -1, -1):
+        if not remaining:
+            break
+        if id(item_pool[i]) in remaining:
+            remaining.remove(id(item_pool[i]))
+            del item_pool[i]
+
+
 def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locations: typing.List[Location],
                      item_pool: typing.List[Item], single_player_placement: bool = False, lock: bool = False,
                      swap: bool = True, on_place: typing.Optional[typing.Callable[[Location], None]] = None,
@@ -58,12 +163,13 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
     reachable_items: typing.Dict[int, typing.Deque[Item]] = {}
     for item in item_pool:
         reachable_items.setdefault(item.player, deque()).append(item)
+    fill_locations = _FillLocations(locations)
 
     # for progress logging
     total = min(len(item_pool), len(locations))
     placed = 0
 
-    while any(reachable_items.values()) and locations:
+    while any(reachable_items.values()) and fill_locations:
         if one_item_per_player:
             # grab one item per player
             items_to_place = [items.pop()
@@ -74,23 +180,23 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
             if item_pool:
                 items_to_place.append(reachable_items[next_player].pop())
 
-        for item in items_to_place:
-            # The items added into `reachable_items` are placed starting from the end of each deque in
-            # `reachable_items`, so the items being placed are more likely to be found towards the end of `item_pool`.
-            for p, pool_item in enumerate(reversed(item_pool), start=1):
-                if pool_item is item:
-                    del item_pool[-p]
-                    break
+        # The items added into `reachable_items` are placed starting from the end of each deque in
+        # `reachable_items`, so the items being placed are more likely to be found towards the end of `item_pool`.
+        _remove_items(item_pool, items_to_place)
+        if items_to_place:
+            # with single_player_placement, all items are of the player whose filled locations get swept
+            item = items_to_place[-1]
 
         maximum_exploration_state = sweep_from_pool(
             base_state, item_pool + unplaced_items, multiworld.get_filled_locations(item.player)
             if single_player_placement else None)
+        fill_locations.update(maximum_exploration_state)
 
         has_beaten_game = multiworld.has_beaten_game(maximum_exploration_state)
 
         while items_to_place:
             # if we have run out of locations to fill,break out of this loop
-            if not locations:
+            if not fill_locations:
                 unplaced_items += items_to_place
                 break
             item_to_place = items_to_place.pop(0)
@@ -105,12 +211,11 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
             else:
                 perform_access_check = True
 
-            for i, location in enumerate(locations):
-                if (not single_player_placement or location.player == item_to_place.player) \
-                        and location.can_fill(maximum_exploration_state, item_to_place, perform_access_check):
-                    # popping by index is faster than removing by content,
-                    spot_to_fill = locations.pop(i)
-                    # skipping a scan for the element
+            for location in fill_locations.iter_candidates(item_to_place.player if single_player_placement else None,
+                                                           perform_access_check):
+                if location.can_fill(maximum_exploration_state, item_to_place, perform_access_check):
+                    spot_to_fill = location
+                    fill_locations.fill(location)
                     break
 
             else:
@@ -205,6 +310,8 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
     if total > 1000:
         _log_fill_progress(name, placed, total)
 
+    locations[:] = fill_locations.unfilled()
+
     if cleanup_required:
         # validate all placements and remove invalid ones
         state = sweep_from_pool(
@@ -745,7 +852,11 @@ def balance_multiworld_progression(multiworld: MultiWorld) -> None:
         logging.debug(balanceable_players)
         state: CollectionState = CollectionState(multiworld)
         checked_locations: typing.Set[Location] = set()
-        unchecked_locations: typing.Set[Location] = set(multiworld.get_locations())
+        # the search only tests the unchecked locations that a change to the state could have made reachable
+        search = _SphereSearch(state, multiworld.get_locations())
+        unchecked_locations: typing.Set[Location] = search.remaining
+        # the spheres after the current one, as found by a balancing attempt. They stay valid until an item is moved.
+        future_spheres: typing.List[typing.Set[Location]] = []
 
         total_locations_count: typing.Counter[int] = Counter(
             location.player
@@ -780,7 +891,7 @@ def balance_multiworld_progression(multiworld: MultiWorld) -> None:
             # Gather non-locked locations.
             # This ensures that only shuffled locations get counted for progression balancing,
             #   i.e. the items the players will be checking.
-            sphere_locations = get_sphere_locations(state, unchecked_locations)
+            sphere_locations = future_spheres.pop(0) if future_spheres else search.next_sphere()
             for location in sphere_locations:
                 unchecked_locations.remove(location)
                 if not location.locked:
@@ -811,10 +922,12 @@ def balance_multiworld_progression(multiworld: MultiWorld) -> None:
                 }
                 if balancing_players:
                     balancing_state = state.copy()
+                    balancing_search: typing.Optional[_SphereSearch] = None
                     balancing_unchecked_locations = unchecked_locations.copy()
                     balancing_reachables = reachable_locations_count.copy()
                     balancing_sphere = sphere_locations.copy()
                     candidate_items: typing.Dict[int, typing.Set[Location]] = collections.defaultdict(set)
+                    balancing_sphere_num = 0
                     while True:
                         # Check locations in the current sphere and gather progression items to swap earlier
                         for location in balancing_sphere:
@@ -828,7 +941,15 @@ def balance_multiworld_progression(multiworld: MultiWorld) -> None:
                                         location.progress_type != LocationProgressType.PRIORITY):
                                     candidate_items[player].add(location)
                                     logging.debug(f"Candidate item: {location.name}, {location.item.name}")
-                        balancing_sphere = get_sphere_locations(balancing_state, balancing_unchecked_locations)
+                        if balancing_sphere_num < len(future_spheres):
+                            balancing_sphere = future_spheres[balancing_sphere_num]
+                        else:
+                            if balancing_search is None:
+                                balancing_search = _SphereSearch(balancing_state, balancing_unchecked_locations)
+                                balancing_unchecked_locations = balancing_search.remaining
+                            balancing_sphere = balancing_search.next_sphere()
+                            future_spheres.append(balancing_sphere)
+                        balancing_sphere_num += 1
                         for location in balancing_sphere:
                             balancing_unchecked_locations.remove(location)
                             if not location.locked:
@@ -846,30 +967,31 @@ def balance_multiworld_progression(multiworld: MultiWorld) -> None:
                         if l not in balancing_unchecked_locations:
                             unlocked_locations[l.player].add(l)
                     items_to_replace: typing.List[Location] = []
+                    balancing_beaten = multiworld.has_beaten_game(balancing_state)
                     for player in balancing_players:
                         locations_to_test = unlocked_locations[player]
                         items_to_test = list(candidate_items[player])
                         items_to_test.sort()
                         multiworld.random.shuffle(items_to_test)
+                        kept_items = {location: location.item for location in items_to_test}
                         while items_to_test:
                             testing = items_to_test.pop()
+                            del kept_items[testing]
                             reducing_state = state.copy()
-                            for location in itertools.chain((
-                                    l for l in items_to_replace
-                                    if l.item.player == player
-                            ), items_to_test):
-                                reducing_state.collect(location.item, True, location)
-
+                            for location, item in kept_items.items():
+                                reducing_state.collect(item, True, location)
                             reducing_state.sweep_for_advancements(locations=locations_to_test)
 
-                            if multiworld.has_beaten_game(balancing_state):
+                            if balancing_beaten:
                                 if not multiworld.has_beaten_game(reducing_state):
                                     items_to_replace.append(testing)
+                                    kept_items[testing] = testing.item
                             else:
                                 reduced_sphere = get_sphere_locations(reducing_state, locations_to_test)
                                 p = item_percentage(player, reachable_locations_count[player] + len(reduced_sphere))
                                 if p < threshold_percentages[player]:
                                     items_to_replace.append(testing)
+                                    kept_items[testing] = testing.item
 
                     old_moved_item_count = moved_item_count
 
@@ -897,6 +1019,7 @@ def balance_multiworld_progression(multiworld: MultiWorld) -> None:
                             logging.warning(f"Could not Progression Balance {old_location.item}")
 
                     if old_moved_item_count < moved_item_count:
+                        future_spheres.clear()
                         logging.debug(f"Moved {moved_item_count} items so far\n")
                         unlocked = {fresh for player in balancing_players for fresh in unlocked_locations[player]}
                         for location in get_sphere_locations(state, unlocked):
@@ -1,13 +1,14 @@
 import collections
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping
 import concurrent.futures
+import contextlib
 import logging
 import os
+import struct
 import tempfile
 import time
 from typing import Any
 import zipfile
-import zlib
 
 import worlds
 from BaseClasses import CollectionState, Item, Location, LocationProgressType, MultiWorld
@@ -15,7 +16,7 @@ from Fill import FillError, balance_multiworld_progression, distribute_items_res
     parse_planned_blocks, distribute_planned_blocks, resolve_early_locations_for_planned
 from NetUtils import convert_to_base_types
 from Options import StartInventoryPool
-from Utils import __version__, output_path, restricted_dumps, version_tuple
+from Utils import __version__, output_path, version_tuple
 from settings import get_settings
 from worlds import AutoWorld
 from worlds.generic.Rules import exclusion_rules, locality_rules
@@ -228,17 +229,40 @@ def main(args, seed=None, baked_server_options: dict[str, object] | None = None)
         with concurrent.futures.ThreadPoolExecutor(len(output_players) + 2) as pool:
             check_accessibility_task = pool.submit(multiworld.fulfills_accessibility)
 
-            output_file_futures = [pool.submit(AutoWorld.call_stage, multiworld, "generate_output", temp_dir)]
+            store_compressed = bool(get_settings().generator.store_compressed_outputs)
+            output_dirs = 0
+
+            def output_dir() -> str:
+                nonlocal output_dirs
+                output_dirs += 1
+                directory = os.path.join(temp_dir, str(output_dirs))
+                os.mkdir(directory)
+                return directory
+
+            def submit_output(function: Callable[..., Any], *args: Any) -> concurrent.futures.Future[str]:
+                """
+                Runs function with its own output directory as last argument in the pool, then compresses the files
+                it wrote there into an archive of their own, so only their compressed bytes are left to copy.
+                """
+                directory = output_dir()
+
+                def output_task() -> str:
+                    function(*args, directory)
+                    return compress_output_files(directory, store_compressed)
+
+                return pool.submit(output_task)
+
+            output_file_futures = [submit_output(AutoWorld.call_stage, multiworld, "generate_output")]
             for player in output_players:
                 # skip starting a thread for methods that say "pass".
                 output_file_futures.append(
-                    pool.submit(AutoWorld.call_single, multiworld, "generate_output", player, temp_dir))
+                    submit_output(AutoWorld.call_single, multiworld, "generate_output", player))
 
             # collect ER hint info
             er_hint_data: dict[int, dict[int, str]] = {}
             AutoWorld.call_all(multiworld, 'extend_hint_information', er_hint_data)
 
-            def write_multidata():
+            def write_multidata(multidata_dir: str):
                 import NetUtils
                 from NetUtils import HintStatus
                 slot_data: dict[int, Mapping[str, Any]] = {}
@@ -345,38 +369,94 @@ def main(args, seed=None, baked_server_options: dict[str, object] | None = None)
                 for key in ("slot_data", "er_hint_data"):
                     multidata[key] = convert_to_base_types(multidata[key])
 
-                multidata = zlib.compress(restricted_dumps(multidata), 9)
+                multidata = NetUtils.dump_multidata(multidata)
 
-                with open(os.path.join(temp_dir, f'{outfilebase}.archipelago'), 'wb') as f:
-                    f.write(bytes([3]))  # version of format
+                with open(os.path.join(multidata_dir, f'{outfilebase}.archipelago'), 'wb') as f:
                     f.write(multidata)
 
-            output_file_futures.append(pool.submit(write_multidata))
+            output_file_futures.append(submit_output(write_multidata))
             if not check_accessibility_task.result():
                 if not multiworld.can_beat_game():
                     raise FillError("Game appears as unbeatable. Aborting.", multiworld=multiworld)
                 else:
                     logger.warning("Location Accessibility requirements not fulfilled.")
 
-            # retrieve exceptions via .result() if they occurred.
-            for i, future in enumerate(concurrent.futures.as_completed(output_file_futures), start=1):
-                if i % 10 == 0 or i == len(output_file_futures):
-                    logger.info(f'Generating output files ({i}/{len(output_file_futures)}).')
-                future.result()
+            zipfilename = output_path(f"AP_{multiworld.seed_name}.zip")
+            logger.info(f"Creating final archive at {zipfilename}")
+            try:
+                with zipfile.ZipFile(zipfilename, mode="w", compression=zipfile.ZIP_DEFLATED,
+                                     compresslevel=9) as zf:
+                    # the files of each output task are copied into the archive as soon as it and the tasks
+                    # before it are done, while the others are still generating and compressing.
+                    written = 0
+                    # retrieve exceptions via .result() if they occurred.
+                    for i, future in enumerate(concurrent.futures.as_completed(output_file_futures), start=1):
+                        if i % 10 == 0 or i == len(output_file_futures):
+                            logger.info(f'Generating output files ({i}/{len(output_file_futures)}).')
+                        future.result()
+                        while written < len(output_file_futures) and output_file_futures[written].done():
+                            write_output_files(zf, output_file_futures[written].result())
+                            written += 1
+
+                    if args.spoiler > 1:
+                        logger.info('Calculating playthrough.')
+                        multiworld.spoiler.create_playthrough(create_paths=args.spoiler > 2)
+
+                    if args.spoiler:
+                        spoiler_dir = output_dir()
+                        multiworld.spoiler.to_file(os.path.join(spoiler_dir, '%s_Spoiler.txt' % outfilebase))
+                        write_output_files(zf, compress_output_files(spoiler_dir, store_compressed))
+            except BaseException:
+                # don't leave an incomplete archive behind
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(zipfilename)
+                raise
 
-        if args.spoiler > 1:
-            logger.info('Calculating playthrough.')
-            multiworld.spoiler.create_playthrough(create_paths=args.spoiler > 2)
+    logger.info('Done. Enjoy. Total Time: %s', time.perf_counter() - start)
+    return multiworld
 
-        if args.spoiler:
-            multiworld.spoiler.to_file(os.path.join(temp_dir, '%s_Spoiler.txt' % outfilebase))
 
-        zipfilename = output_path(f"AP_{multiworld.seed_name}.zip")
-        logger.info(f"Creating final archive at {zipfilename}")
-        with zipfile.ZipFile(zipfilename, mode="w", compression=zipfile.ZIP_DEFLATED,
-                             compresslevel=9) as zf:
-            for file in os.scandir(temp_dir):
+def compress_output_files(directory: str, store_compressed: bool) -> str:
+    """
+    Compresses the files in directory into a zip archive next to it, in order of their names.
+
+    :param directory: The directory an output task wrote its files into
+    :param store_compressed: Whether to store files that are zip archives themselves, such as most patch files,
+                             without compressing them again
+    :return: The path of the archive
+    """
+    archive = directory + ".zip"
+    with zipfile.ZipFile(archive, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for file in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if store_compressed and zipfile.is_zipfile(file.path):
+                zf.write(file.path, arcname=file.name, compress_type=zipfile.ZIP_STORED)
+            else:
                 zf.write(file.path, arcname=file.name)
-
-    logger.info('Done. Enjoy. Total Time: %s', time.perf_counter() - start)
-    return multiworld
+    return archive
+
+
+def write_output_files(zf: zipfile.ZipFile, archive: str) -> None:
+    """
+    Copies the members of an archive from compress_output_files into zf as they are, without compressing them again.
+
+    :param zf: The archive to write into
+    :param archive: The archive of the files of one output task
+    :raises FileExistsError: If a file of the same name was written into the archive by another output task
+    """
+    with zipfile.ZipFile(archive) as source, open(archive, "rb") as source_file:
+        for info in source.infolist():
+            if info.filename in zf.NameToInfo:
+                raise FileExistsError(f"Output file {info.filename} was written by more than one output task.")
+            # the local header may have other extra data than the central directory, so skip it by its own lengths
+            source_file.seek(info.header_offset)
+            header = source_file.read(zipfile.sizeFileHeader)
+            name_length, extra_length = struct.unpack("<HH", header[-4:])
+            source_file.seek(name_length + extra_length, os.SEEK_CUR)
+            data = source_file.read(info.compress_size)
+            info.header_offset = zf.fp.tell()
+            zf.fp.write(info.FileHeader())
+            zf.fp.write(data)
+            zf.filelist.append(info)
+            zf.NameToInfo[info.filename] = info
+            zf.start_dir = zf.fp.tell()
+            zf._didModify = True
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import argparse
+import array
 import asyncio
+import bisect
 import collections
 import contextlib
 import copy
@@ -13,9 +15,11 @@ import itertools
 import logging
 import math
 import operator
+import os
 import pickle
 import random
 import shlex
+import struct
 import threading
 import time
 import typing
@@ -124,6 +128,27 @@ def get_saving_second(seed_name: str, interval: int = 60) -> int:
     return int(hashlib.sha256(seed_name.encode()).hexdigest(), 16) % interval
 
 
+def apply_save_journal(save_data: typing.Dict[str, typing.Any], records: typing.Iterable[tuple]) -> None:
+    """Applies save journal records to the save data of Context.get_save. Applying a record again has no effect."""
+    for kind, *record in records:
+        if kind == "location_checks":
+            team_and_slot, locations = record
+            save_data["location_checks"].setdefault(team_and_slot, set()).update(locations)
+        elif kind == "received_items":
+            key, start, items = record
+            save_data["received_items"].setdefault(key, [])[start:] = items
+        elif kind == "hints":
+            team_and_slot, hints = record
+            save_data["hints"][team_and_slot] = set(hints)
+        elif kind == "stored_data":
+            key, value = record
+            save_data["stored_data"][key] = value
+        elif kind == "state":
+            save_data.update(record[0])
+        else:
+            raise ValueError(f"Unknown save journal record {kind}")
+
+
 class Client(Endpoint):
     version = Version(0, 0, 0)
     tags: typing.List[str]
@@ -132,6 +157,7 @@ class Client(Endpoint):
     no_items: bool
     no_locations: bool
     no_text: bool
+    no_unrelated_item_sends: bool
 
     def __init__(self, socket: "ServerConnection", ctx: Context) -> None:
         super().__init__(socket)
@@ -168,6 +194,139 @@ class Client(Endpoint):
 team_slot = typing.Tuple[int, int]
 
 
+class ServerMetrics:
+    """
+    Optional metrics of a server: how often each client command is processed and how long it takes, the traffic of
+    each slot, the lag of the event loop and the duration of saves.
+    Shown by the /metrics server command, and served in the Prometheus text format with --metrics_port.
+    """
+    buckets: typing.ClassVar[typing.Tuple[float, ...]] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                                          0.5, 1.0, 2.5)
+    """upper bounds in seconds of the histogram buckets"""
+    client_commands: typing.ClassVar[typing.FrozenSet[str]] = frozenset((
+        "Connect", "ConnectUpdate", "Sync", "LocationChecks", "LocationScouts", "CreateHints", "UpdateHint",
+        "StatusUpdate", "Say", "Bounce", "GetDataPackage", "Get", "Set", "SetNotify"))
+    """commands with their own metrics, anything else a client sends is counted as "other" """
+
+    class Histogram:
+        __slots__ = ("counts", "count", "sum", "max")
+
+        def __init__(self) -> None:
+            self.counts = [0] * (len(ServerMetrics.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+        def observe(self, seconds: float) -> None:
+            self.counts[bisect.bisect_left(ServerMetrics.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    commands: typing.Dict[str, Histogram]
+    bytes_received: typing.Counter[typing.Optional[team_slot]]
+    """length of the messages received from each slot, None for clients that are not connected to a slot"""
+    bytes_sent: typing.Counter[typing.Optional[team_slot]]
+    loop_lag: Histogram
+    saves: Histogram
+
+    def __init__(self) -> None:
+        self.commands = collections.defaultdict(ServerMetrics.Histogram)
+        self.bytes_received = collections.Counter()
+        self.bytes_sent = collections.Counter()
+        self.loop_lag = ServerMetrics.Histogram()
+        self.saves = ServerMetrics.Histogram()
+
+    @staticmethod
+    def _slot(endpoint: Endpoint) -> typing.Optional[team_slot]:
+        return (endpoint.team, endpoint.slot) if getattr(endpoint, "auth", False) else None
+
+    def observe_command(self, args: typing.Any, seconds: float) -> None:
+        cmd = args.get("cmd", None) if isinstance(args, dict) else None
+        self.commands[cmd if cmd in self.client_commands else "other"].observe(seconds)
+
+    def count_received(self, endpoint: Endpoint, length: int) -> None:
+        self.bytes_received[self._slot(endpoint)] += length
+
+    def count_sent(self, endpoint: Endpoint, length: int) -> None:
+        self.bytes_sent[self._slot(endpoint)] += length
+
+    async def sample_loop_lag(self, interval: float = 1) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            wakeup = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(loop.time() - wakeup)
+
+    def summary(self) -> typing.List[str]:
+        """Human-readable lines of the metrics, the commands that took the most time first."""
+        lines = []
+        for cmd, histogram in sorted(self.commands.items(), key=lambda item: -item[1].sum):
+            lines.append(f"{cmd}: {histogram.count} processed, {histogram.sum:.3f}s total, "
+                         f"{histogram.sum / histogram.count * 1000:.2f}ms average, {histogram.max * 1000:.2f}ms max")
+        for name, histogram in (("Event loop lag", self.loop_lag), ("Saves", self.saves)):
+            if histogram.count:
+                lines.append(f"{name}: {histogram.count} samples, {histogram.sum / histogram.count * 1000:.2f}ms "
+                             f"average, {histogram.max * 1000:.2f}ms max")
+        for name, counter in (("Received", self.bytes_received), ("Sent", self.bytes_sent)):
+            top = ", ".join(f"{'unconnected' if slot is None else slot}: {Utils.format_SI_prefix(length)}B"
+                            for slot, length in counter.most_common(5))
+            if top:
+                lines.append(f"{name}: {Utils.format_SI_prefix(sum(counter.values()))}B total, top slots {top}")
+        return lines or ["No metrics collected yet."]
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines: typing.List[str] = []
+
+        def histogram(name: str, help_text: str,
+                      histograms: typing.Iterable[typing.Tuple[str, ServerMetrics.Histogram]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in histograms:
+                separator = "," if labels else ""
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+                labels = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{labels} {hist.sum}")
+                lines.append(f"{name}_count{labels} {hist.count}")
+
+        def counter(name: str, help_text: str, values: typing.Counter[typing.Optional[team_slot]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for slot, value in values.items():
+                labels = 'team="",slot=""' if slot is None else f'team="{slot[0]}",slot="{slot[1]}"'
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        histogram("archipelago_command_seconds", "Time spent processing client commands.",
+                  ((f'cmd="{cmd}"', hist) for cmd, hist in self.commands.items()))
+        histogram("archipelago_event_loop_lag_seconds", "How late the event loop woke up.", (("", self.loop_lag),))
+        histogram("archipelago_save_seconds", "Time spent saving.", (("", self.saves),))
+        counter("archipelago_received_bytes_total", "Length of the messages received from clients.",
+                self.bytes_received)
+        counter("archipelago_sent_bytes_total", "Length of the messages sent to clients.", self.bytes_sent)
+        return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(metrics: ServerMetrics, port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """Serves the metrics in the Prometheus text format over HTTP, for any request."""
+    async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass  # skip the request
+            body = metrics.render().encode()
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(respond, host, port)
+
+
 class Context:
     dumper = staticmethod(encode)
     loader = staticmethod(decode)
@@ -204,6 +363,8 @@ class Context:
     non_hintable_names: typing.Dict[str, typing.AbstractSet[str]]
     spheres: typing.List[typing.Dict[int, typing.Set[int]]]
     """ each sphere is { player: { location_id, ... } } """
+    sphere_index: typing.Dict[int, typing.Tuple[array.array, array.array]]
+    """ player: (sorted location_ids, sphere of each location), built from spheres for get_sphere """
     logger: logging.Logger
 
     def __init__(self, host: str, port: int, server_password: str, password: str, location_check_points: int,
@@ -232,6 +393,9 @@ class Context:
         self.server = None
         self.countdown_timer = 0
         self.received_items = {}
+        self.received_items_dirty: typing.Set[team_slot] = set()
+        """(team, slot)s that received items since the last ReceivedItems flush, see send_new_items."""
+        self.received_items_flush: typing.Optional[asyncio.Handle] = None
         self.start_inventory = {}
         self.name_aliases: typing.Dict[team_slot, str] = {}
         self.location_checks = collections.defaultdict(set)
@@ -239,6 +403,8 @@ class Context:
         self.location_check_points = location_check_points
         self.hints_used = collections.defaultdict(int)
         self.hints: typing.Dict[team_slot, typing.Set[Hint]] = collections.defaultdict(set)
+        self.hint_index: typing.Dict[typing.Tuple[int, int, int], typing.Set[Hint]] = {}
+        """(team, finding_player, location) -> hints in the finding player's hints that a check of location updates"""
         self.release_mode: str = release_mode
         self.remaining_mode: str = remaining_mode
         self.collect_mode: str = collect_mode
@@ -257,6 +423,18 @@ class Context:
         self.auto_save_interval = 60  # in seconds
         self.auto_saver_thread: typing.Optional[threading.Thread] = None
         self.save_dirty = False
+        self.save_journal = False
+        self.save_journal_records: typing.Deque[tuple] = collections.deque()
+        self.save_journal_generation = 0
+        self.save_journal_size = 0
+        self.save_snapshot_size = 0
+        self.metrics: typing.Optional[ServerMetrics] = None
+        """collected if enabled, see ServerMetrics"""
+        self.journaled_received_items: typing.Dict[typing.Tuple[int, int, bool], int] = {}
+        """how many received items of each key the save and its journal hold"""
+        self.save_journal_received_items: typing.Set[team_slot] = set()
+        self.save_journal_hints: typing.Set[team_slot] = set()
+        """slots whose received items or hints changed since the last save, see record_received_items_change"""
         self.tags = ['AP']
         self.games: typing.Dict[int, str] = {}
         self.minimum_client_versions: typing.Dict[int, Version] = {}
@@ -268,6 +446,7 @@ class Context:
         self.stored_data_notification_clients = collections.defaultdict(weakref.WeakSet)
         self.read_data = {}
         self.spheres = []
+        self.sphere_index = {}
 
         # init empty to satisfy linter, I suppose
         self.gamespackage = {}
@@ -339,6 +518,8 @@ class Context:
             await self.disconnect(endpoint)
             return False
         else:
+            if self.metrics:
+                self.metrics.count_sent(endpoint, len(msg))
             if self.log_network:
                 self.logger.info(f"Outgoing message: {msg}")
             return True
@@ -353,6 +534,8 @@ class Context:
             await self.disconnect(endpoint)
             return False
         else:
+            if self.metrics:
+                self.metrics.count_sent(endpoint, len(msg))
             if self.log_network:
                 self.logger.info(f"Outgoing message: {msg}")
             return True
@@ -362,6 +545,8 @@ class Context:
         for endpoint in endpoints:
             if endpoint.socket and endpoint.socket.open:
                 sockets.append(endpoint.socket)
+                if self.metrics:
+                    self.metrics.count_sent(endpoint, len(msg))
         try:
             websockets.broadcast(sockets, msg)
         except RuntimeError:
@@ -388,14 +573,31 @@ class Context:
 
     def broadcast_team(self, team: int, msgs: typing.List[dict]):
         msg_is_text = all(msg["cmd"] == "PrintJSON" for msg in msgs)
+        has_item_sends = any(msg.get("type") == "ItemSend" for msg in msgs)
         data = self.dumper(msgs)
-        endpoints = (
-            endpoint
-            for endpoint in itertools.chain.from_iterable(self.clients[team].values())
-            if not (msg_is_text and endpoint.no_text)
-        )
+        endpoints = []
+        for slot, clients in self.clients[team].items():
+            filtered_data: typing.Optional[str] = None
+            for endpoint in clients:
+                if msg_is_text and endpoint.no_text:
+                    continue
+                if not (has_item_sends and endpoint.no_unrelated_item_sends):
+                    endpoints.append(endpoint)
+                    continue
+                # filtered messages are the same for all clients of a slot, so they are only encoded once per slot
+                if filtered_data is None:
+                    filtered_msgs = [msg for msg in msgs if not self.is_unrelated_item_send(msg, slot)]
+                    filtered_data = self.dumper(filtered_msgs) if filtered_msgs else ""
+                if filtered_data:
+                    async_start(self.send_encoded_msgs(endpoint, filtered_data))
         async_start(self.broadcast_send_encoded_msgs(endpoints, data))
 
+    def is_unrelated_item_send(self, msg: dict, slot: int) -> bool:
+        """Checks if msg is an ItemSend PrintJSON that neither comes from nor goes to slot or a group of slot."""
+        return msg.get("type") == "ItemSend" \
+            and slot not in self.slot_set(msg["receiving"]) \
+            and slot not in self.slot_set(msg["item"].player)
+
     def broadcast(self, endpoints: typing.Iterable[Client], msgs: typing.List[dict]):
         msgs = self.dumper(msgs)
         async_start(self.broadcast_send_encoded_msgs(endpoints, msgs))
@@ -439,11 +641,8 @@ class Context:
         self.data_filename = multidatapath
 
     @staticmethod
-    def decompress(data: bytes) -> dict:
-        format_version = data[0]
-        if format_version > 3:
-            raise Utils.VersionException("Incompatible multidata.")
-        return restricted_loads(zlib.decompress(data[1:]))
+    def decompress(data: bytes) -> typing.MutableMapping[str, typing.Any]:
+        return NetUtils.load_multidata(data)
 
     def _load(self, decoded_obj: MultiData, game_data_packages: typing.Dict[str, typing.Any],
               use_embedded_server_options: bool):
@@ -489,8 +688,8 @@ class Context:
         self.connect_names = decoded_obj['connect_names']
         self.locations = LocationStore(decoded_obj.pop("locations"))  # pre-emptively free memory
         self.slot_data = decoded_obj['slot_data']
-        for slot, data in self.slot_data.items():
-            self.read_data[f"slot_data_{slot}"] = lambda data=data: data
+        for slot in self.slot_data:
+            self.read_data[f"slot_data_{slot}"] = lambda local_slot=slot: self.slot_data[local_slot]
         self.er_hint_data = {int(player): {int(address): name for address, name in loc_data.items()}
                              for player, loc_data in decoded_obj["er_hint_data"].items()}
 
@@ -500,6 +699,7 @@ class Context:
 
         for slot, hints in decoded_obj["precollected_hints"].items():
             self.hints[0, slot].update(hints)
+        self._init_hint_index()
 
         # declare slots that aren't players as done
         for slot, slot_info in self.slot_info.items():
@@ -530,6 +730,19 @@ class Context:
 
         # sorted access spheres
         self.spheres = decoded_obj.get("spheres", [])
+        self._init_sphere_index()
+
+    def _init_sphere_index(self):
+        player_spheres: typing.Dict[int, typing.List[typing.Tuple[int, int]]] = collections.defaultdict(list)
+        for sphere_number, sphere in enumerate(self.spheres):
+            for player, location_ids in sphere.items():
+                player_spheres[player].extend((location_id, sphere_number) for location_id in location_ids)
+        self.sphere_index = {}
+        for player, location_spheres in player_spheres.items():
+            # sorted by location_id, the same order the LocationStore keeps a sender's locations in
+            location_spheres.sort()
+            self.sphere_index[player] = (array.array("q", (location_id for location_id, _ in location_spheres)),
+                                         array.array("I", (sphere_number for _, sphere_number in location_spheres)))
 
     # saving
 
@@ -545,29 +758,135 @@ class Context:
         return False
 
     def _save(self, exit_save: bool = False) -> bool:
+        start = time.perf_counter()
         try:
-            # Does not use Utils.restricted_dumps because we'd rather make a save than not make one
-            encoded_save = pickle.dumps(self.get_save())
-            with open(self.save_filename, "wb") as f:
-                f.write(zlib.compress(encoded_save))
+            if self.save_journal and not exit_save and self.save_journal_size < self.save_snapshot_size:
+                self._append_save_journal()
+            else:
+                self._write_save_snapshot()
         except Exception as e:
             self.logger.exception(e)
             return False
         else:
+            if self.metrics:
+                self.metrics.saves.observe(time.perf_counter() - start)
             return True
 
+    @property
+    def save_journal_filename(self) -> str:
+        return self.save_filename + ".journal"
+
+    def _write_save_snapshot(self) -> None:
+        save_data = self.get_save()
+        if self.save_journal:
+            self.save_journal_generation += 1
+            save_data["journal_generation"] = self.save_journal_generation
+            self._track_save_journal(save_data)
+        # Does not use Utils.restricted_dumps because we'd rather make a save than not make one
+        encoded_save = zlib.compress(pickle.dumps(save_data))
+        with open(self.save_filename, "wb") as f:
+            f.write(encoded_save)
+        if self.save_journal:
+            # records of the previous generation are covered by the snapshot now
+            with open(self.save_journal_filename, "wb"):
+                pass
+            self.save_journal_size = 0
+            self.save_snapshot_size = len(encoded_save)
+
+    def _track_save_journal(self, save_data: typing.Dict[str, typing.Any]) -> None:
+        """Remembers what of save_data is persisted, so the next journal flush only has to write what changed since."""
+        self.journaled_received_items = {key: len(items) for key, items in save_data["received_items"].items()}
+        self.save_journal_received_items.clear()
+        self.save_journal_hints.clear()
+
+    def _append_save_journal(self) -> None:
+        """
+        Appends everything that changed since the last flush as one frame to the journal.
+        Changes are recorded as they happen, only the small remaining parts of the save are written in full.
+        """
+        records: typing.List[tuple] = []
+        while self.save_journal_records:
+            records.append(self.save_journal_records.popleft())
+        changed_slots, self.save_journal_received_items = self.save_journal_received_items, set()
+        for team, slot in changed_slots:
+            for remote_items in (False, True):
+                key = team, slot, remote_items
+                items = self.received_items.get(key, ())
+                start = self.journaled_received_items.get(key, 0)
+                if len(items) > start:
+                    records.append(("received_items", key, start, items[start:]))
+                    self.journaled_received_items[key] = len(items)
+        changed_slots, self.save_journal_hints = self.save_journal_hints, set()
+        for key in changed_slots:
+            records.append(("hints", key, frozenset(self.hints[key])))
+        records.append(("state", self.get_save_state()))
+
+        # Does not use Utils.restricted_dumps because we'd rather make a save than not make one
+        frame = zlib.compress(pickle.dumps((self.save_journal_generation, records)))
+        try:
+            with open(self.save_journal_filename, "ab") as f:
+                f.write(struct.pack("<I", len(frame)))
+                f.write(frame)
+        except Exception:
+            # the drained changes are lost from the journal, so fall back to a full snapshot next time
+            self.save_snapshot_size = 0
+            raise
+        self.save_journal_size += 4 + len(frame)
+
+    def _read_save(self) -> typing.Dict[str, typing.Any]:
+        """Reads the save snapshot and, in journal mode, replays the journal frames that were written after it."""
+        with open(self.save_filename, 'rb') as f:
+            encoded_save = f.read()
+        save_data = restricted_loads(zlib.decompress(encoded_save))
+        if not self.save_journal:
+            return save_data
+
+        self.save_snapshot_size = len(encoded_save)
+        self.save_journal_generation = save_data.get("journal_generation", 0)
+        try:
+            with open(self.save_journal_filename, 'rb') as f:
+                journal = f.read()
+        except FileNotFoundError:
+            journal = b""
+        position = 0
+        while position + 4 <= len(journal):
+            length, = struct.unpack_from("<I", journal, position)
+            frame = journal[position + 4:position + 4 + length]
+            if len(frame) < length:
+                self.logger.warning("Save journal ends in an incomplete record, which is skipped.")
+                break
+            position += 4 + length
+            generation, records = restricted_loads(zlib.decompress(frame))
+            if generation == self.save_journal_generation:
+                apply_save_journal(save_data, records)
+        self.save_journal_size = os.path.getsize(self.save_journal_filename) if journal else 0
+        self._track_save_journal(save_data)
+        return save_data
+
+    def record_save_change(self, *record: typing.Any) -> None:
+        """Records a change to the save data for the journal, if journaling is enabled. See apply_save_journal."""
+        if self.save_journal:
+            self.save_journal_records.append(record)
+
+    def record_received_items_change(self, team: int, slot: int) -> None:
+        """Records that items were appended to the received items of a slot, for the save journal."""
+        if self.save_journal:
+            self.save_journal_received_items.add((team, slot))
+
+    def record_hints_change(self, team: int, slot: int) -> None:
+        """Records that the hints of a slot changed, for the save journal."""
+        if self.save_journal:
+            self.save_journal_hints.add((team, slot))
+
     def init_save(self, enabled: bool = True):
         self.saving = enabled
         if self.saving:
             if not self.save_filename:
-                import os
                 name, ext = os.path.splitext(self.data_filename)
                 self.save_filename = name + '.apsave' if ext.lower() in ('.archipelago', '.zip') \
                     else self.data_filename + '_' + 'apsave'
             try:
-                with open(self.save_filename, 'rb') as f:
-                    save_data = restricted_loads(zlib.decompress(f.read()))
-                    self.set_save(save_data)
+                self.set_save(self._read_save())
             except FileNotFoundError:
                 self.logger.error('No save data found, starting a new game')
             except Exception as e:
@@ -606,14 +925,21 @@ class Context:
                 atexit.register(self._save, True)  # make sure we save on exit too
 
     def get_save(self) -> dict:
-        self.recheck_hints()
         d = {
-            "version": self.save_version,
             "connect_names": self.connect_names,
             "received_items": self.received_items,
-            "hints_used": dict(self.hints_used),
             "hints": dict(self.hints),
             "location_checks": dict(self.location_checks),
+            "stored_data": self.stored_data,
+        }
+        d.update(self.get_save_state())
+        return d
+
+    def get_save_state(self) -> dict:
+        """The parts of get_save that the save journal writes in full on every save, as they are small."""
+        d = {
+            "version": self.save_version,
+            "hints_used": dict(self.hints_used),
             "name_aliases": self.name_aliases,
             "client_game_state": dict(self.client_game_state),
             "client_activity_timers": tuple(
@@ -622,7 +948,6 @@ class Context:
                 (key, value.timestamp()) for key, value in self.client_connection_timers.items()),
             "random_state": self.random.getstate(),
             "group_collected": dict(self.group_collected),
-            "stored_data": self.stored_data,
             "game_options": {"hint_cost": self.hint_cost, "location_check_points": self.location_check_points,
                              "server_password": self.server_password, "password": self.password,
                              "release_mode": self.release_mode,
@@ -669,6 +994,9 @@ class Context:
 
         if "stored_data" in savedata:
             self.stored_data = savedata["stored_data"]
+        # from here on, hints are kept up to date as locations get checked
+        self._init_hint_index()
+        self.recheck_hints()
         # count items and slots from lists for items_handling = remote
         self.logger.info(
             f'Loaded save file with {sum([len(v) for k, v in self.received_items.items() if k[2]])} received items '
@@ -698,13 +1026,52 @@ class Context:
                 new_hints.add(new_hint)
                 if hint == new_hint:
                     continue
+                if hint_slot == hint.finding_player:
+                    self._unindex_hint(hint_team, hint)
+                    self._index_hint(hint_team, new_hint)
                 for player in self.slot_set(hint.receiving_player) | {hint.finding_player}:
                     if changed is not None:
                         changed.add((hint_team,player))
                     if slot is not None and slot != player:
                         self.replace_hint(hint_team, player, hint, new_hint)
+            if new_hints != self.hints[hint_team, hint_slot]:
+                self.record_hints_change(hint_team, hint_slot)
             self.hints[hint_team, hint_slot] = new_hints
 
+    def recheck_location_hints(self, team: int, slot: int, locations: typing.Iterable[int],
+                               changed: typing.Optional[typing.Set[team_slot]] = None) -> None:
+        """Refreshes the hints for newly checked locations of team/slot, using hint_index.
+        Each (team, slot) pair that has at least one hint modified will be added to 'changed', if passed.
+        """
+        for location in locations:
+            for hint in self.hint_index.get((team, slot, location), ()).copy():
+                new_hint = hint.re_check(self, team)
+                if hint == new_hint:
+                    continue
+                for player in self.slot_set(hint.receiving_player) | {hint.finding_player}:
+                    if changed is not None:
+                        changed.add((team, player))
+                    self.replace_hint(team, player, hint, new_hint)
+
+    def _init_hint_index(self) -> None:
+        self.hint_index = {}
+        for (team, slot), hints in self.hints.items():
+            for hint in hints:
+                if hint.finding_player == slot:
+                    self._index_hint(team, hint)
+
+    def _index_hint(self, team: int, hint: Hint) -> None:
+        if not hint.found or hint.status != HintStatus.HINT_FOUND:
+            self.hint_index.setdefault((team, hint.finding_player, hint.location), set()).add(hint)
+
+    def _unindex_hint(self, team: int, hint: Hint) -> None:
+        key = (team, hint.finding_player, hint.location)
+        hints = self.hint_index.get(key)
+        if hints is not None:
+            hints.discard(hint)
+            if not hints:
+                del self.hint_index[key]
+
     def get_rechecked_hints(self, team: int, slot: int):
         self.recheck_hints(team, slot)
         return self.hints[team, slot]
@@ -712,13 +1079,19 @@ class Context:
     def get_sphere(self, player: int, location_id: int) -> int:
         """Get sphere of a location, -1 if spheres are not available."""
         if self.spheres:
-            for i, sphere in enumerate(self.spheres):
-                if location_id in sphere.get(player, set()):
-                    return i
+            if player in self.sphere_index:
+                location_ids, sphere_numbers = self.sphere_index[player]
+                i = bisect.bisect_left(location_ids, location_id)
+                if i < len(location_ids) and location_ids[i] == location_id:
+                    return sphere_numbers[i]
             raise KeyError(f"No Sphere found for location ID {location_id} belonging to player {player}. "
                            f"Location or player may not exist.")
         return -1
 
+    def get_spheres_for(self, player: int, location_ids: typing.Iterable[int]) -> typing.List[int]:
+        """Get spheres of multiple locations of a player, all -1 if spheres are not available."""
+        return [self.get_sphere(player, location_id) for location_id in location_ids]
+
     def get_players_package(self):
         return [NetworkPlayer(t, p, self.get_aliased_name(t, p), n) for (t, p), n in self.player_names.items()]
 
@@ -775,6 +1148,7 @@ class Context:
                 # we can check once if hint already exists
                 if hint not in self.hints[team, hint.finding_player]:
                     self.hints[team, hint.finding_player].add(hint)
+                    self._index_hint(team, hint)
                     new_hint_events.add(hint.finding_player)
                     for player in self.slot_set(hint.receiving_player):
                         self.hints[team, player].add(hint)
@@ -782,6 +1156,7 @@ class Context:
 
             self.logger.info("Notice (Team #%d): %s" % (team + 1, format_hint(self, team, hint)))
         for slot in new_hint_events:
+            self.record_hints_change(team, slot)
             self.on_new_hint(team, slot)
         for slot, hint_data in concerns.items():
             if recipients is None or slot in recipients:
@@ -789,8 +1164,9 @@ class Context:
                 if not clients:
                     continue
                 client_hints = [datum[1] for datum in sorted(hint_data, key=lambda x: x[0].finding_player != slot)]
+                encoded_hints = self.dumper(client_hints)  # encode once for all clients of the slot
                 for client in clients:
-                    async_start(self.send_msgs(client, client_hints))
+                    async_start(self.send_encoded_msgs(client, encoded_hints))
 
     def get_hint(self, team: int, finding_player: int, seeked_location: int) -> typing.Optional[Hint]:
         for hint in self.hints[team, finding_player]:
@@ -802,6 +1178,10 @@ class Context:
         if old_hint in self.hints[team, slot]:
             self.hints[team, slot].remove(old_hint)
             self.hints[team, slot].add(new_hint)
+            self.record_hints_change(team, slot)
+            if slot == old_hint.finding_player:
+                self._unindex_hint(team, old_hint)
+                self._index_hint(team, new_hint)
     
     # "events"
 
@@ -857,8 +1237,15 @@ async def server(websocket: "ServerConnection", path: str = "/", ctx: Context =
         async for data in websocket:
             if ctx.log_network:
                 ctx.logger.info(f"Incoming message: {data}")
-            for msg in decode(data):
-                await process_client_cmd(ctx, client, msg)
+            if ctx.metrics:
+                ctx.metrics.count_received(client, len(data))
+                for msg in decode(data):
+                    start = time.perf_counter()
+                    await process_client_cmd(ctx, client, msg)
+                    ctx.metrics.observe_command(msg, time.perf_counter() - start)
+            else:
+                for msg in decode(data):
+                    await process_client_cmd(ctx, client, msg)
     except Exception as e:
         if not isinstance(e, websockets.WebSocketException):
             ctx.logger.exception(e)
@@ -1024,20 +1411,37 @@ def get_start_inventory(ctx: Context, player: int, remote_start_inventory: bool)
 
 
 def send_new_items(ctx: Context):
-    for team, clients in ctx.clients.items():
-        for slot, clients in clients.items():
-            for client in clients:
-                if client.no_items:
-                    continue
-                start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
-                items = get_received_items(ctx, team, slot, client.remote_items)
-                if len(start_inventory) + len(items) > client.send_index:
-                    first_new_item = max(0, client.send_index - len(start_inventory))
-                    async_start(ctx.send_msgs(client, [{
-                        "cmd": "ReceivedItems",
-                        "index": client.send_index,
-                        "items": start_inventory[client.send_index:] + items[first_new_item:]}]))
-                    client.send_index = len(start_inventory) + len(items)
+    """
+    Sends ReceivedItems to the clients of all (team, slot)s that received items since the last flush.
+    When called from within the event loop, the flush is deferred to the end of the current tick, so that many item
+    sends in a row, like a release or collect, result in a single ReceivedItems per client.
+    """
+    if ctx.received_items_flush:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_new_items(ctx)
+    else:
+        ctx.received_items_flush = loop.call_soon(flush_new_items, ctx)
+
+
+def flush_new_items(ctx: Context):
+    ctx.received_items_flush = None
+    dirty, ctx.received_items_dirty = ctx.received_items_dirty, set()
+    for team, slot in dirty:
+        for client in ctx.clients.get(team, {}).get(slot, ()):
+            if client.no_items:
+                continue
+            start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
+            items = get_received_items(ctx, team, slot, client.remote_items)
+            if len(start_inventory) + len(items) > client.send_index:
+                first_new_item = max(0, client.send_index - len(start_inventory))
+                async_start(ctx.send_msgs(client, [{
+                    "cmd": "ReceivedItems",
+                    "index": client.send_index,
+                    "items": start_inventory[client.send_index:] + items[first_new_item:]}]))
+                client.send_index = len(start_inventory) + len(items)
 
 
 def update_checked_locations(ctx: Context, team: int, slot: int):
@@ -1085,6 +1489,8 @@ def send_items_to(ctx: Context, team: int, target_slot: int, *items: NetworkItem
             if item.player != target_slot:
                 get_received_items(ctx, team, target, False).append(item)
             get_received_items(ctx, team, target, True).append(item)
+        ctx.received_items_dirty.add((team, target))
+        ctx.record_received_items_change(team, target)
 
 
 def register_location_checks(ctx: Context, team: int, slot: int, locations: typing.Iterable[int],
@@ -1122,6 +1528,7 @@ def register_location_checks(ctx: Context, team: int, slot: int, locations: typi
         del sortable
 
         ctx.location_checks[team, slot] |= new_locations
+        ctx.record_save_change("location_checks", (team, slot), new_locations)
         send_new_items(ctx)
         ctx.broadcast(ctx.clients[team][slot], [{
             "cmd": "RoomUpdate",
@@ -1129,7 +1536,7 @@ def register_location_checks(ctx: Context, team: int, slot: int, locations: typi
             "checked_locations": new_locations,  # send back new checks only
         }])
         updated_slots: typing.Set[tuple[int, int]] = set()
-        ctx.recheck_hints(team, slot, updated_slots)
+        ctx.recheck_location_hints(team, slot, new_locations, updated_slots)
         for hint_team, hint_slot in updated_slots:
             ctx.on_changed_hints(hint_team, hint_slot)
         ctx.save()
@@ -1615,6 +2022,8 @@ class ClientMessageProcessor(CommonCommandProcessor):
                 new_item = NetworkItem(names[item_name], -1, self.client.slot)
                 get_received_items(self.ctx, self.client.team, self.client.slot, False).append(new_item)
                 get_received_items(self.ctx, self.client.team, self.client.slot, True).append(new_item)
+                self.ctx.received_items_dirty.add((self.client.team, self.client.slot))
+                self.ctx.record_received_items_change(self.client.team, self.client.slot)
                 self.ctx.broadcast_text_all(
                     'Cheat console: sending "' + item_name + '" to ' + self.ctx.get_aliased_name(self.client.team,
                                                                                                  self.client.slot),
@@ -1632,9 +2041,7 @@ class ClientMessageProcessor(CommonCommandProcessor):
         points_available = get_client_points(self.ctx, self.client)
         cost = self.ctx.get_hint_cost(self.client.slot)
         if not input_text:
-            hints = {hint.re_check(self.ctx, self.client.team) for hint in
-                     self.ctx.hints[self.client.team, self.client.slot]}
-            self.ctx.hints[self.client.team, self.client.slot] = hints
+            hints = self.ctx.get_rechecked_hints(self.client.team, self.client.slot)
             self.ctx.notify_hints(self.client.team, list(hints), recipients=(self.client.slot,))
             self.output(f"A hint costs {self.ctx.get_hint_cost(self.client.slot)} points. "
                         f"You have {points_available} points.")
@@ -1857,6 +2264,7 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             client.no_locations = bool(client.tags & _non_game_messages.keys())
             # set NoText for old PopTracker clients that predate the tag to save traffic
             client.no_text = "NoText" in client.tags or ("PopTracker" in client.tags and client.version < (0, 5, 1))
+            client.no_unrelated_item_sends = "NoUnrelatedItemSends" in client.tags
             connected_packet = {
                 "cmd": "Connected",
                 "team": client.team, "slot": client.slot,
@@ -1932,6 +2340,7 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
                     client.no_text = "NoText" in client.tags or (
                         "PopTracker" in client.tags and client.version < (0, 5, 1)
                     )
+                    client.no_unrelated_item_sends = "NoUnrelatedItemSends" in client.tags
                     ctx.broadcast_text_all(
                         f"{ctx.get_aliased_name(client.team, client.slot)} (Team #{client.team + 1}) has changed tags "
                         f"from {old_tags} to {client.tags}.",
@@ -2127,6 +2536,7 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
                 func = modify_functions[operation["operation"]]
                 value = func(value, operation["value"])
             ctx.stored_data[args["key"]] = args["value"] = value
+            ctx.record_save_change("stored_data", args["key"], value)
             targets = set(ctx.stored_data_notification_clients[args["key"]])
             if args.get("want_reply", False):
                 targets.add(client)
@@ -2187,6 +2597,15 @@ class ServerCommandProcessor(CommonCommandProcessor):
         self.output(get_players_string(self.ctx))
         return True
 
+    def _cmd_metrics(self) -> bool:
+        """Show the time spent on each client command, the traffic of slots, event loop lag and save durations"""
+        if not self.ctx.metrics:
+            self.output("Metrics are disabled. Start the server with --metrics to collect them.")
+            return False
+        for line in self.ctx.metrics.summary():
+            self.output(line)
+        return True
+
     def _cmd_status(self, tag: str = "") -> bool:
         """Get status information about teams.
         Optionally mention a Tag name and get information on who has that Tag.
@@ -2511,6 +2930,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--password', default=defaults["password"])
     parser.add_argument('--savefile', default=defaults["savefile"])
     parser.add_argument('--disable_save', default=defaults["disable_save"], action='store_true')
+    parser.add_argument('--save_journal', default=defaults["save_journal"], action='store_true',
+                        help="Append changes to a journal next to the save file, instead of rewriting the whole save "
+                             "each time. The journal is compacted into the save file once it outgrows it.")
     parser.add_argument('--cert', help="Path to a SSL Certificate for encryption.")
     parser.add_argument('--cert_key', help="Path to SSL Certificate Key file")
     parser.add_argument('--loglevel', default=defaults["loglevel"],
@@ -2558,6 +2980,12 @@ def parse_args() -> argparse.Namespace:
     #0 -> recommended for tournaments to force a level playing field, only allow an exact version match
     """)
     parser.add_argument('--log_network', default=defaults["log_network"], action="store_true")
+    parser.add_argument('--metrics', default=defaults["metrics"], action="store_true",
+                        help="Collect metrics of client commands, traffic, event loop lag and saves, "
+                             "shown by the /metrics server command.")
+    parser.add_argument('--metrics_port', default=defaults["metrics_port"], type=int,
+                        help="Serve metrics in the Prometheus text format on this port of localhost. "
+                             "Implies --metrics.")
     args = parser.parse_args()
     return args
 
@@ -2634,6 +3062,9 @@ async def main(args: argparse.Namespace):
         logging.exception(f"Failed to read multiworld data ({e})")
         raise
 
+    ctx.save_journal = args.save_journal
+    if args.metrics or args.metrics_port:
+        ctx.metrics = ServerMetrics()
     ctx.init_save(not args.disable_save)
 
     ssl_context = load_server_cert(args.cert, args.cert_key) if args.cert else None
@@ -2644,11 +3075,17 @@ async def main(args: argparse.Namespace):
                                                  'No password' if not ctx.password else 'Password: %s' % ctx.password))
 
     await ctx.server
+    loop_lag_task = asyncio.create_task(ctx.metrics.sample_loop_lag()) if ctx.metrics else None
+    if ctx.metrics and args.metrics_port:
+        await serve_metrics(ctx.metrics, args.metrics_port)
+        logging.info(f"Serving metrics at http://127.0.0.1:{args.metrics_port}/metrics")
     console_task = asyncio.create_task(console(ctx))
     if ctx.auto_shutdown:
         ctx.shutdown_task = asyncio.create_task(auto_shutdown(ctx, [console_task]))
     await ctx.exit_event.wait()
     console_task.cancel()
+    if loop_lag_task:
+        loop_lag_task.cancel()
     if ctx.shutdown_task:
         await ctx.shutdown_task
 
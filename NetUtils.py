@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-from collections.abc import Mapping, Sequence
+from collections.abc import Mapping, MutableMapping, Sequence
 import typing
 import enum
+import struct
 import warnings
+import zlib
 from json import JSONEncoder, JSONDecoder
 
 if typing.TYPE_CHECKING:
     from websockets import WebSocketServerProtocol as ServerConnection
 
-from Utils import ByValue, Version
+from Utils import ByValue, Version, VersionException, restricted_dumps, restricted_loads
 
 
 class HintStatus(ByValue, enum.IntEnum):
@@ -135,7 +137,38 @@ _encode = JSONEncoder(
 ).encode
 
 
+_typed_tuple_fields: dict[type, tuple[tuple[str, ...], str]] = {}
+"""NamedTuple type -> (field names, class name), filled on first encode of each type."""
+
+
+def _encode_default(obj: typing.Any) -> typing.Any:
+    # orjson hands NamedTuples, sets and unknown types to this, everything else is encoded natively
+    try:
+        fields, class_name = _typed_tuple_fields[type(obj)]
+    except KeyError:
+        if isinstance(obj, tuple) and hasattr(obj, "_fields"):
+            fields, class_name = _typed_tuple_fields.setdefault(type(obj), (obj._fields, obj.__class__.__name__))
+        elif isinstance(obj, (set, frozenset)):
+            return tuple(obj)
+        else:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    data = dict(zip(fields, obj))
+    data["class"] = class_name
+    return data
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
 def encode(obj: typing.Any) -> str:
+    if orjson:
+        try:
+            return orjson.dumps(obj, default=_encode_default, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers above 64 bit, which the json module can still encode
     return _encode(_scan_for_TypedTuples(obj))
 
 
@@ -425,20 +458,28 @@ class _LocationStore(dict, typing.MutableMapping[int, typing.Dict[int, typing.Tu
         if len(self.get(0, {})):
             raise ValueError("Invalid player id 0 for location")
 
+        # receiving player -> item id -> [(finding player, location id, item flags)], built once since the store is
+        # not modified after loading the multidata
+        self._receiver_index: typing.Dict[int, typing.Dict[int, typing.List[typing.Tuple[int, int, int]]]] = {}
+        for finding_player, check_data in sorted(self.items()):
+            for location_id, (item_id, receiving_player, item_flags) in sorted(check_data.items()):
+                self._receiver_index.setdefault(receiving_player, {}).setdefault(item_id, []).append(
+                    (finding_player, location_id, item_flags))
+
     def find_item(self, slots: typing.Set[int], seeked_item_id: int
                   ) -> typing.Generator[typing.Tuple[int, int, int, int, int], None, None]:
-        for finding_player, check_data in self.items():
-            for location_id, (item_id, receiving_player, item_flags) in check_data.items():
-                if receiving_player in slots and item_id == seeked_item_id:
-                    yield finding_player, location_id, item_id, receiving_player, item_flags
+        for receiving_player in sorted(slots):
+            receiver_items = self._receiver_index.get(receiving_player)
+            if receiver_items:
+                for finding_player, location_id, item_flags in receiver_items.get(seeked_item_id, ()):
+                    yield finding_player, location_id, seeked_item_id, receiving_player, item_flags
 
     def get_for_player(self, slot: int) -> typing.Dict[int, typing.Set[int]]:
         import collections
         all_locations: typing.Dict[int, typing.Set[int]] = collections.defaultdict(set)
-        for source_slot, location_data in self.items():
-            for location_id, values in location_data.items():
-                if values[1] == slot:
-                    all_locations[source_slot].add(location_id)
+        for locations in self._receiver_index.get(slot, {}).values():
+            for finding_player, location_id, _ in locations:
+                all_locations[finding_player].add(location_id)
         return all_locations
 
     def get_checked(self, state: typing.Dict[typing.Tuple[int, int], typing.Set[int]], team: int, slot: int
@@ -508,6 +549,99 @@ class MultiData(typing.TypedDict):
     race_mode: int
 
 
+multidata_format_version = 4
+"""Version byte of the .archipelago files written by dump_multidata. Versions up to 3 are a single zlib-compressed
+pickle, version 4 is an index header followed by independently compressed sections."""
+_multidata_split_sections = frozenset({"slot_data", "datapackage"})
+"""Sections that are further split up into one compressed section per key, i.e. per slot or per game."""
+_multidata_header = struct.Struct("<I")
+
+
+class LazyMultiData(MutableMapping):
+    """
+    Multidata read from format version 4. Each section is only decompressed and unpickled on first access,
+    and is cached afterwards. Split sections like slot_data are themselves a LazyMultiData per key.
+    """
+    __slots__ = ("_data", "_index", "_loaded")
+
+    def __init__(self, data: bytes, index: dict[typing.Any, typing.Any]) -> None:
+        self._data = data
+        self._index = index
+        self._loaded: dict[typing.Any, typing.Any] = {}
+
+    def __getitem__(self, key: typing.Any) -> typing.Any:
+        try:
+            return self._loaded[key]
+        except KeyError:
+            entry = self._index[key]
+        if isinstance(entry, dict):
+            value = LazyMultiData(self._data, entry)
+        else:
+            offset, length = entry
+            value = restricted_loads(zlib.decompress(self._data[offset:offset + length]))
+        self._loaded[key] = value
+        return value
+
+    def __setitem__(self, key: typing.Any, value: typing.Any) -> None:
+        self._index.setdefault(key, None)
+        self._loaded[key] = value
+
+    def __delitem__(self, key: typing.Any) -> None:
+        del self._index[key]
+        self._loaded.pop(key, None)
+
+    def __iter__(self) -> typing.Iterator[typing.Any]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self._index)})"
+
+
+def dump_multidata(multidata: Mapping[str, typing.Any]) -> bytes:
+    """Encodes multidata as an .archipelago file of the current format version, including the version byte."""
+    sections: list[bytes] = []
+    position = 0
+
+    def add_section(value: typing.Any) -> tuple[int, int]:
+        nonlocal position
+        section = zlib.compress(restricted_dumps(value), 9)
+        sections.append(section)
+        position += len(section)
+        return position - len(section), len(section)
+
+    index: dict[str, typing.Any] = {}
+    for key, value in multidata.items():
+        if key in _multidata_split_sections:
+            index[key] = {sub_key: add_section(sub_value) for sub_key, sub_value in value.items()}
+        else:
+            index[key] = add_section(value)
+    header = zlib.compress(restricted_dumps(index))
+    return b"".join((bytes([multidata_format_version]), _multidata_header.pack(len(header)), header, *sections))
+
+
+def load_multidata(data: bytes) -> MutableMapping[str, typing.Any]:
+    """
+    Decodes an .archipelago file, including the version byte. Format version 4 is loaded lazily, section by section,
+    older versions are loaded into a dict all at once.
+    """
+    format_version = data[0]
+    if format_version > multidata_format_version:
+        raise VersionException("Incompatible multidata.")
+    if format_version < 4:
+        return restricted_loads(zlib.decompress(data[1:]))
+    header_start = 1 + _multidata_header.size
+    header_length, = _multidata_header.unpack_from(data, 1)
+    body_start = header_start + header_length
+    index = restricted_loads(zlib.decompress(data[header_start:body_start]))
+    return LazyMultiData(memoryview(data)[body_start:], index)
+
+
 if typing.TYPE_CHECKING:  # type-check with pure python implementation until we have a typing stub
     LocationStore = _LocationStore
 else:
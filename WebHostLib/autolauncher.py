@@ -110,16 +110,28 @@ def autohost(config: dict):
                     hoster = MultiworldInstance(config, x)
                     hosters.append(hoster)
                     hoster.start()
-
-                while not stop_event.wait(0.1):
+                placements = RoomPlacements()
+                poller = RoomPoller()
+
+                while not stop_event.wait(poller.interval):
+                    now = datetime.utcnow()
+                    for hoster in hosters:
+                        for room_id in hoster.update():
+                            poller.recheck.add(room_id)
+                            placements.shut_down(room_id, now)
+                    placements.prune(now)
+                    started = False
                     with db_session:
-                        rooms = select(
-                            room for room in Room if
-                            room.last_activity >= datetime.utcnow() - timedelta(days=3))
-                        for room in rooms:
-                            # we have to filter twice, as the per-room timeout can't currently be PonyORM transpiled.
-                            if room.last_activity >= datetime.utcnow() - timedelta(seconds=room.timeout + 5):
-                                hosters[room.id.int % len(hosters)].start_room(room.id)
+                        for room in poller.poll():
+                            hoster = placements.get(room.id)
+                            if hoster is None:
+                                hoster = min(hosters, key=MultiworldInstance.placement_key)
+                                placements.place(room.id, hoster)
+                                logging.info(f"Placing room {room.id} on {hoster.name}, {hoster.load}.")
+                            if room.id not in hoster.room_slots:
+                                hoster.start_room(room.id, room.seed.slots.count())
+                                started = True
+                    poller.adapt_interval(started)
 
         except AlreadyRunningException:
             logging.info("Autohost reports as already running, not starting another.")
@@ -164,9 +176,88 @@ def autogen(config: dict):
     Thread(target=keep_running, name="AP_Autogen").start()
 
 
+class RoomPoller:
+    """
+    Finds the rooms that may have to be started.
+    A room only has to be started after its last_activity was set, by a visit of its page or a command,
+    so only rooms with a last_activity newer than the previous poll are loaded, which the index on it finds,
+    instead of all rooms of the last days.
+    """
+    min_interval: float = 0.1
+    max_interval: float = 1.0
+    """seconds between polls, doubled for every poll that starts no room"""
+    commit_margin: float = 5
+    """seconds that a last_activity may be committed after it was taken, which the next poll looks back further"""
+    max_timeout: timedelta = timedelta(days=3)
+    """rooms inactive for longer than this are not started again, even with a longer timeout"""
+
+    def __init__(self):
+        self.since: datetime | None = None
+        self.interval = self.min_interval
+        self.recheck: set[UUID] = set()
+        """rooms that shut down, which are started again if their last_activity was set while they shut down"""
+
+    def poll(self) -> list[Room]:
+        """Returns the rooms that had activity since the last poll and did not time out. Requires a db_session."""
+        now = datetime.utcnow()
+        since = self.since if self.since is not None else now - self.max_timeout
+        rooms = list(select(room for room in Room if room.last_activity > since))
+        if self.recheck:
+            room_ids = list(self.recheck)
+            rooms += select(room for room in Room if room.id in room_ids and room.last_activity <= since)
+            self.recheck.clear()
+        self.since = now - timedelta(seconds=self.commit_margin)
+        # we have to filter twice, as the per-room timeout can't currently be PonyORM transpiled.
+        return [room for room in rooms if room.last_activity >= now - timedelta(seconds=room.timeout + 5)]
+
+    def adapt_interval(self, started: bool):
+        """Polls quickly after rooms were started, as more are likely to follow, and slows down otherwise."""
+        self.interval = self.min_interval if started else min(self.interval * 2, self.max_interval)
+
+
+class RoomPlacements:
+    """
+    Remembers the hoster of each room, so that rooms are started on the same hoster again and their last_port stays
+    valid. Rooms that shut down are forgotten once their last_activity is older than the poller looks back.
+    """
+
+    def __init__(self, max_age: timedelta = RoomPoller.max_timeout):
+        self.max_age = max_age
+        self.hosters: dict[UUID, MultiworldInstance] = {}
+        self.shut_down_at: dict[UUID, datetime] = {}
+        """room id -> time of shutdown of the rooms that are not running, the oldest first"""
+
+    def get(self, room_id: UUID) -> MultiworldInstance | None:
+        """Returns the hoster the room was placed on, after which it is running again."""
+        self.shut_down_at.pop(room_id, None)
+        return self.hosters.get(room_id)
+
+    def place(self, room_id: UUID, hoster: MultiworldInstance):
+        self.hosters[room_id] = hoster
+
+    def shut_down(self, room_id: UUID, now: datetime):
+        self.shut_down_at.pop(room_id, None)
+        self.shut_down_at[room_id] = now
+
+    def prune(self, now: datetime):
+        """Forgets the rooms that shut down longer than max_age ago."""
+        expired = now - self.max_age
+        while self.shut_down_at:
+            room_id, shut_down = next(iter(self.shut_down_at.items()))
+            if shut_down >= expired:
+                break
+            del self.shut_down_at[room_id]
+            self.hosters.pop(room_id, None)
+
+
 class MultiworldInstance():
+    lagging_threshold: float = 0.5
+    """seconds of event loop lag above which a hoster only gets new rooms if all others lag as well"""
+
     def __init__(self, config: dict, id: int):
-        self.room_ids = set()
+        self.room_slots: dict[UUID, int] = {}
+        """room id -> slot count of the rooms started on this hoster that have not shut down"""
+        self.load: HosterLoad | None = None
         self.process: typing.Optional[multiprocessing.Process] = None
         self.ponyconfig = config["PONY"]
         self.cert = config["SELFLAUNCHCERT"]
@@ -174,6 +265,7 @@ class MultiworldInstance():
         self.host = config["HOST_ADDRESS"]
         self.rooms_to_start = multiprocessing.Queue()
         self.rooms_shutting_down = multiprocessing.Queue()
+        self.load_reports = multiprocessing.Queue()
         self.name = f"MultiHoster{id}"
 
     def start(self):
@@ -183,18 +275,36 @@ class MultiworldInstance():
         process = multiprocessing.Process(group=None, target=run_server_process,
                                           args=(self.name, self.ponyconfig, get_static_server_data(),
                                                 self.cert, self.key, self.host,
-                                                self.rooms_to_start, self.rooms_shutting_down),
+                                                self.rooms_to_start, self.rooms_shutting_down, self.load_reports),
                                           name=self.name)
         process.start()
         self.process = process
 
-    def start_room(self, room_id):
+    def update(self) -> list[UUID]:
+        """Takes in the rooms that shut down, which are returned, and the latest load reported by the process."""
+        shut_down = []
         while not self.rooms_shutting_down.empty():
-            self.room_ids.remove(self.rooms_shutting_down.get(block=True, timeout=None))
-        if room_id in self.room_ids:
+            room_id = self.rooms_shutting_down.get(block=True, timeout=None)
+            del self.room_slots[room_id]
+            shut_down.append(room_id)
+        while not self.load_reports.empty():
+            self.load = self.load_reports.get(block=True, timeout=None)
+        return shut_down
+
+    def placement_key(self) -> tuple[bool, int, int]:
+        """Sorts hosters by how suited they are for a new room, the least loaded first."""
+        lagging = self.load is not None and self.load.loop_lag > self.lagging_threshold
+        clients = self.load.clients if self.load else 0
+        rss = self.load.rss if self.load else 0
+        # slots of rooms that just started count before their clients connect
+        return lagging, sum(self.room_slots.values()) + clients, rss
+
+    def start_room(self, room_id, slots: int = 0):
+        # update() is left to autohost, which rechecks the rooms that shut down
+        if room_id in self.room_slots:
             pass  # should already be hosted currently.
         else:
-            self.room_ids.add(room_id)
+            self.room_slots[room_id] = slots
             self.rooms_to_start.put(room_id)
 
     def stop(self):
@@ -211,5 +321,5 @@ class MultiworldInstance():
 
 
 from .models import Room, Generation, STATE_QUEUED, STATE_STARTED, STATE_ERROR, db, Seed, Slot
-from .customserver import run_server_process, get_static_server_data
+from .customserver import HosterLoad, run_server_process, get_static_server_data
 from .generate import gen_game
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import collections
+import concurrent.futures
 import datetime
 import functools
 import logging
@@ -19,7 +20,8 @@ from pony.orm import commit, db_session, select
 
 import Utils
 
-from MultiServer import Context, server, auto_shutdown, ServerCommandProcessor, ClientMessageProcessor, load_server_cert
+from MultiServer import Context, server, auto_shutdown, ServerCommandProcessor, ClientMessageProcessor, \
+    load_server_cert, ServerMetrics
 from Utils import restricted_loads, cache_argsless
 from .locker import Locker
 from .models import Command, GameDataPackage, Room, db
@@ -57,6 +59,171 @@ class DBCommandProcessor(ServerCommandProcessor):
         self.ctx.logger.info(text)
 
 
+class DBCommandDispatcher(threading.Thread):
+    """
+    Polls the database for commands to all rooms hosted by this process with a single query,
+    and hands them to the event loop of their room.
+    """
+    poll_interval: float = 5
+    report_interval: float = 300
+    """seconds between logging the query metrics"""
+    _rooms: typing.Dict[int, typing.Tuple[WebHostContext, DBCommandProcessor]]
+
+    def __init__(self):
+        super().__init__(name="DBCommandDispatcher", daemon=True)
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._query_time = 0.0
+        self._commands = 0
+
+    def register(self, ctx: WebHostContext):
+        with self._lock:
+            self._rooms[ctx.room_id] = ctx, DBCommandProcessor(ctx)
+
+    def unregister(self, ctx: WebHostContext):
+        with self._lock:
+            if ctx.room_id in self._rooms and self._rooms[ctx.room_id][0] is ctx:
+                del self._rooms[ctx.room_id]
+
+    def run(self):
+        report_start = time.perf_counter()
+        while 1:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                rooms = self._rooms.copy()
+            if rooms:
+                try:
+                    self.poll(rooms)
+                except Exception as e:
+                    # a failed poll leaves the commands in the database for the next one
+                    logging.exception(e)
+            elapsed = time.perf_counter() - report_start
+            if elapsed >= self.report_interval:
+                self.report(elapsed, len(rooms))
+                report_start += elapsed
+
+    @db_session
+    def poll(self, rooms: typing.Dict[int, typing.Tuple[WebHostContext, DBCommandProcessor]]):
+        start = time.perf_counter()
+        room_ids = list(rooms)
+        commands = select(command for command in Command if command.room.id in room_ids).order_by(Command.id)[:]
+        for command in commands:
+            ctx, cmdprocessor = rooms[command.room.id]
+            ctx.main_loop.call_soon_threadsafe(cmdprocessor, command.commandtext)
+            command.delete()
+        if commands:
+            commit()
+        self._queries += 1
+        self._query_time += time.perf_counter() - start
+        self._commands += len(commands)
+
+    def report(self, elapsed: float, room_count: int):
+        average = self._query_time / self._queries * 1000 if self._queries else 0
+        logging.info(f"Command polling for {room_count} rooms: {self._queries / elapsed:.2f} queries/s, "
+                     f"{average:.1f} ms per query, {self._commands} commands dispatched.")
+        self._queries = 0
+        self._query_time = 0.0
+        self._commands = 0
+
+
+class RoomSaveScheduler:
+    """
+    Saves the dirty rooms hosted by this process every interval, instead of a saving thread per room.
+    The saves are serialized by a bounded pool of worker threads, and written to the database in batched transactions,
+    one at a time. While the database is slow, rooms that become dirty wait for the next batch.
+    """
+    interval: float
+    batch_size: int
+    _rooms: typing.Set[WebHostContext]
+    _saving: typing.Set[WebHostContext]
+    """rooms of the batch that is currently being saved"""
+    _batch: typing.Optional[asyncio.Future]
+
+    def __init__(self, interval: float = 60, workers: int = 4, batch_size: int = 50):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._rooms = set()
+        self._saving = set()
+        self._batch = None
+        self._serializers = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="RoomSaveSerializer")
+        self._writer = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="RoomSaveWriter")
+
+    def register(self, ctx: WebHostContext):
+        self._rooms.add(ctx)
+
+    async def unregister(self, ctx: WebHostContext):
+        """Stops saving the room, waiting for a batch that is saving it, so that it can be saved a final time."""
+        self._rooms.discard(ctx)
+        if ctx in self._saving and self._batch:
+            await asyncio.wait((self._batch,))
+
+    async def run(self):
+        while 1:
+            await asyncio.sleep(self.interval)
+            dirty = [ctx for ctx in self._rooms if ctx.save_dirty]
+            for start in range(0, len(dirty), self.batch_size):
+                self._batch = asyncio.ensure_future(self.save(dirty[start:start + self.batch_size]))
+                await asyncio.wait((self._batch,))
+                self._batch = None
+
+    async def save(self, rooms: typing.List[WebHostContext]):
+        rooms = [ctx for ctx in rooms if ctx in self._rooms]  # some may have been unregistered by earlier batches
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self._saving.update(rooms)
+        try:
+            for ctx in rooms:
+                ctx.save_dirty = False
+            dumps = await asyncio.gather(*(loop.run_in_executor(self._serializers, self.dump, ctx) for ctx in rooms),
+                                         return_exceptions=True)
+            dumped: typing.List[typing.Tuple[WebHostContext, bytes, float]] = []
+            for ctx, dump in zip(rooms, dumps):
+                if isinstance(dump, BaseException):
+                    # the other rooms of the batch are still saved, only this one is retried
+                    logging.error(f"Saving room {ctx.room_id} failed. Retry in {self.interval} seconds.", exc_info=dump)
+                    ctx.save_dirty = True
+                else:
+                    dumped.append((ctx, *dump))
+            if dumped:
+                await loop.run_in_executor(self._writer, self.write, [ctx.room_id for ctx, _, _ in dumped],
+                                           [save for _, save, _ in dumped])
+        except Exception as e:
+            logging.exception(e)
+            logging.info(f"Saving {len(rooms)} rooms failed. Retry in {self.interval} seconds.")
+            for ctx in rooms:
+                ctx.save_dirty = True
+        else:
+            # metrics are not thread safe, so the durations are only recorded back on the event loop
+            for ctx, _, dump_duration in dumped:
+                if ctx.metrics:
+                    ctx.metrics.saves.observe(dump_duration)
+        finally:
+            self._saving.difference_update(rooms)
+        duration = time.perf_counter() - start
+        if duration > self.interval:
+            logging.warning(f"Saving {len(rooms)} rooms took {duration:.1f} seconds.")
+
+    @staticmethod
+    def dump(ctx: WebHostContext) -> typing.Tuple[bytes, float]:
+        """Returns the save of the room and how long it took to dump it."""
+        start = time.perf_counter()
+        save = ctx.dump_save()
+        return save, time.perf_counter() - start
+
+    @staticmethod
+    @db_session
+    def write(room_ids: typing.List[int], saves: typing.List[bytes]):
+        now = datetime.datetime.utcnow()
+        for room_id, save in zip(room_ids, saves):
+            room = Room.get(id=room_id)
+            if not room:
+                continue
+            room.multisave = save
+            # saving only occurs on activity, so we can "abuse" this information to mark this as last_activity
+            room.last_activity = now
+
+
 class WebHostContext(Context):
     room_id: int
 
@@ -71,6 +238,8 @@ class WebHostContext(Context):
         self.main_loop = asyncio.get_running_loop()
         self.video = {}
         self.tags = ["AP", "WebHost"]
+        if Utils.get_settings().server_options.metrics:
+            self.metrics = ServerMetrics()  # event loop lag is shared by all rooms of a hoster, see report_load
 
     def __del__(self):
         try:
@@ -86,19 +255,6 @@ class WebHostContext(Context):
             setattr(self, key, value)
         self.non_hintable_names = collections.defaultdict(frozenset, self.non_hintable_names)
 
-    def listen_to_db_commands(self):
-        cmdprocessor = DBCommandProcessor(self)
-
-        while not self.exit_event.is_set():
-            with db_session:
-                commands = select(command for command in Command if command.room.id == self.room_id)
-                if commands:
-                    for command in commands:
-                        self.main_loop.call_soon_threadsafe(cmdprocessor, command.commandtext)
-                        command.delete()
-                    commit()
-            time.sleep(5)
-
     @db_session
     def load(self, room_id: int):
         self.room_id = room_id
@@ -153,25 +309,57 @@ class WebHostContext(Context):
             savegame_data = Room.get(id=self.room_id).multisave
             if savegame_data:
                 self.set_save(restricted_loads(Room.get(id=self.room_id).multisave))
-            self._start_async_saving(atexit_save=False)
-        threading.Thread(target=self.listen_to_db_commands, daemon=True).start()
 
     @db_session
     def _save(self, exit_save: bool = False) -> bool:
         room = Room.get(id=self.room_id)
-        # Does not use Utils.restricted_dumps because we'd rather make a save than not make one
-        room.multisave = pickle.dumps(self.get_save())
+        room.multisave = self.dump_save()
         # saving only occurs on activity, so we can "abuse" this information to mark this as last_activity
         if not exit_save:  # we don't want to count a shutdown as activity, which would restart the server again
             room.last_activity = datetime.datetime.utcnow()
         return True
 
+    def dump_save(self) -> bytes:
+        # Does not use Utils.restricted_dumps because we'd rather make a save than not make one
+        return pickle.dumps(self.get_save())
+
     def get_save(self) -> dict:
         d = super(WebHostContext, self).get_save()
         d["video"] = [(tuple(playerslot), videodata) for playerslot, videodata in self.video.items()]
         return d
 
 
+class HosterLoad(typing.NamedTuple):
+    """The load of a room hosting process, as reported to the autohost loop"""
+    rooms: int
+    clients: int
+    """connected clients across all rooms"""
+    rss: int
+    """resident memory in bytes, 0 if psutil is not available"""
+    loop_lag: float
+    """the most seconds that the event loop woke up late since the last report"""
+
+
+async def report_load(contexts: typing.Set[WebHostContext], load_reports: multiprocessing.Queue,
+                      samples: int = 5):
+    """Measures the event loop lag every second, and reports the load of this process every samples seconds."""
+    try:
+        import psutil
+    except ImportError:
+        process = None
+    else:
+        process = psutil.Process()
+    loop = asyncio.get_running_loop()
+    while 1:
+        loop_lag = 0.0
+        for _ in range(samples):
+            wakeup = loop.time() + 1
+            await asyncio.sleep(1)
+            loop_lag = max(loop_lag, loop.time() - wakeup)
+        rss = process.memory_info().rss if process else 0
+        load_reports.put(HosterLoad(len(contexts), sum(len(ctx.endpoints) for ctx in contexts), rss, loop_lag))
+
+
 def get_random_port():
     return random.randint(49152, 65535)
 
@@ -227,7 +415,8 @@ def set_up_logging(room_id) -> logging.Logger:
 
 def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
                        cert_file: typing.Optional[str], cert_key_file: typing.Optional[str],
-                       host: str, rooms_to_run: multiprocessing.Queue, rooms_shutting_down: multiprocessing.Queue):
+                       host: str, rooms_to_run: multiprocessing.Queue, rooms_shutting_down: multiprocessing.Queue,
+                       load_reports: multiprocessing.Queue):
     from setproctitle import setproctitle
 
     setproctitle(name)
@@ -272,6 +461,13 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
 
     loop = asyncio.get_event_loop()
 
+    command_dispatcher = DBCommandDispatcher()
+    command_dispatcher.start()
+    save_scheduler = RoomSaveScheduler()
+    save_scheduler_task = loop.create_task(save_scheduler.run())  # the event loop only keeps a weak reference
+    contexts: typing.Set[WebHostContext] = set()
+    load_report_task = loop.create_task(report_load(contexts, load_reports))
+
     async def start_room(room_id):
         with Locker(f"RoomLocker {room_id}"):
             try:
@@ -279,6 +475,10 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
                 ctx = WebHostContext(static_server_data, logger)
                 ctx.load(room_id)
                 ctx.init_save()
+                contexts.add(ctx)
+                command_dispatcher.register(ctx)
+                if ctx.saving:
+                    save_scheduler.register(ctx)
                 assert ctx.server is None
                 try:
                     ctx.server = websockets.serve(
@@ -316,6 +516,7 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
 
             except (KeyboardInterrupt, SystemExit):
                 if ctx.saving:
+                    await save_scheduler.unregister(ctx)
                     ctx._save()
                     setattr(asyncio.current_task(), "save", None)
             except Exception as e:
@@ -326,12 +527,18 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
                 raise
             else:
                 if ctx.saving:
+                    await save_scheduler.unregister(ctx)
                     ctx._save()
                     setattr(asyncio.current_task(), "save", None)
             finally:
                 try:
-                    ctx.save_dirty = False  # make sure the saving thread does not write to DB after final wakeup
-                    ctx.exit_event.set()  # make sure the saving thread stops at some point
+                    await save_scheduler.unregister(ctx)  # make sure no batch writes to DB after the final save
+                    ctx.exit_event.set()
+                    contexts.discard(ctx)
+                    command_dispatcher.unregister(ctx)
+                    if ctx.metrics:
+                        for line in ctx.metrics.summary():
+                            ctx.logger.info(f"Metrics: {line}")
                     # NOTE: async saving should probably be an async task and could be merged with shutdown_task
                     with (db_session):
                         # ensure the Room does not spin up again on its own, minute of safety buffer
@@ -14,6 +14,7 @@ from cpython cimport PyObject
 from typing import Any, Dict, Iterable, Iterator, Generator, Sequence, Tuple, TypeVar, Union, Set, List, TYPE_CHECKING
 from cymem.cymem cimport Pool
 from libc.stdint cimport int64_t, uint32_t
+from libc.stdlib cimport qsort
 from collections import defaultdict
 
 cdef extern from *:
@@ -69,6 +70,23 @@ cdef struct IndexEntry:
     size_t count
 
 
+cdef struct ReceiverEntry:
+    # item is duplicated from the LocationEntry so that searching a receiver's items does not have to follow pointers
+    ap_id_t item
+    size_t entry  # offset into LocationStore.entries
+
+
+cdef int _compare_receiver_entries(const void* a, const void* b) noexcept nogil:
+    # order by item, then by entry, which keeps the (sender, location) order of entries within an item
+    cdef const ReceiverEntry* x = <const ReceiverEntry*>a
+    cdef const ReceiverEntry* y = <const ReceiverEntry*>b
+    if x.item != y.item:
+        return -1 if x.item < y.item else 1
+    if x.entry != y.entry:
+        return -1 if x.entry < y.entry else 1
+    return 0
+
+
 if TYPE_CHECKING:
     State = Dict[Tuple[int, int], Set[int]]
 else:
@@ -92,6 +110,9 @@ cdef class LocationStore:
     cdef size_t entry_count
     cdef IndexEntry* sender_index  # 16KB/1000 players
     cdef size_t sender_index_size
+    cdef ReceiverEntry* receiver_entries  # 1.6MB/100k items, entries grouped by receiver and sorted by item
+    cdef IndexEntry* receiver_index  # 16KB/1000 players, ranges of receiver_entries
+    cdef size_t receiver_index_size
     cdef list _keys  # ~36KB/1000 players, speed up iter (28 per int + 8 per list entry)
     cdef list _items  # ~64KB/1000 players, speed up items (56 per tuple + 8 per list entry)
     cdef list _proxies  # ~92KB/1000 players, speed up self[player] (56 per struct + 28 per len + 8 per list entry)
@@ -100,7 +121,8 @@ cdef class LocationStore:
     def get_size(self):
         from sys import getsizeof
         size = getsizeof(self) + getsizeof(self._mem) + getsizeof(self._len) \
-                + sizeof(LocationEntry) * self.entry_count + sizeof(IndexEntry) * self.sender_index_size
+                + sizeof(LocationEntry) * self.entry_count + sizeof(IndexEntry) * self.sender_index_size \
+                + sizeof(ReceiverEntry) * self.entry_count + sizeof(IndexEntry) * self.receiver_index_size
         size += getsizeof(self._keys) + getsizeof(self._items) + getsizeof(self._proxies)
         size += sum(sizeof(key) for key in self._keys)
         size += sum(sizeof(item) for item in self._items)
@@ -117,6 +139,7 @@ cdef class LocationStore:
 
         # iterate over everything to get all maxima and validate everything
         cdef size_t max_sender = INVALID_SIZE  # keep track of highest used player id for indexing
+        cdef size_t max_receiver = 0
         cdef size_t sender_count = 0
         cdef size_t count = 0
         for sender, locations in locations_dict.items():
@@ -131,6 +154,7 @@ cdef class LocationStore:
                 receiver = data[1]
                 if receiver < 1 or receiver > MAX_PLAYER_ID:
                     raise ValueError(f"Invalid player id {receiver} for item")
+                max_receiver = max(max_receiver, receiver)
                 count += 1
             sender_count += 1
 
@@ -148,11 +172,15 @@ cdef class LocationStore:
         if count:
             # leaving entries as NULL if there are none, makes potential memory errors more visible
             self.entries = <LocationEntry*>self._mem.alloc(count, sizeof(LocationEntry))
+            self.receiver_entries = <ReceiverEntry*>self._mem.alloc(count, sizeof(ReceiverEntry))
         self.sender_index = <IndexEntry*>self._mem.alloc(max_sender + 1, sizeof(IndexEntry))
+        self.receiver_index = <IndexEntry*>self._mem.alloc(max_receiver + 1, sizeof(IndexEntry))
         self._raw_proxies = <PyObject**>self._mem.alloc(max_sender + 1, sizeof(PyObject*))
 
         assert (not self.entries) == (not count)
+        assert (not self.receiver_entries) == (not count)
         assert self.sender_index
+        assert self.receiver_index
         assert self._raw_proxies
 
         # build entries and index
@@ -170,8 +198,28 @@ cdef class LocationStore:
                     self.entries[i].flags = data[2]  # initialized to 0 during alloc
                 # Ignoring extra data. warn?
                 self.sender_index[sender].count += 1
+                self.receiver_index[self.entries[i].receiver].count += 1
                 i += 1
 
+        # build receiver index: bucket entries by receiver, then sort each bucket by item
+        cdef size_t start = 0
+        cdef ap_player_t receiver_id
+        for receiver_id in range(max_receiver + 1):
+            self.receiver_index[receiver_id].start = start
+            start += self.receiver_index[receiver_id].count
+            self.receiver_index[receiver_id].count = 0  # recounted while filling the buckets below
+        cdef IndexEntry* bucket
+        for i in range(count):
+            bucket = self.receiver_index + self.entries[i].receiver
+            self.receiver_entries[bucket.start + bucket.count].item = self.entries[i].item
+            self.receiver_entries[bucket.start + bucket.count].entry = i
+            bucket.count += 1
+        for receiver_id in range(max_receiver + 1):
+            bucket = self.receiver_index + receiver_id
+            if bucket.count > 1:
+                qsort(self.receiver_entries + bucket.start, bucket.count, sizeof(ReceiverEntry),
+                      _compare_receiver_entries)
+
         # build pyobject caches
         self._proxies.append(None)  # player 0
         assert self.sender_index[0].count == 0
@@ -187,6 +235,7 @@ cdef class LocationStore:
             self._raw_proxies[i] = <PyObject*>proxy
 
         self.sender_index_size = max_sender + 1
+        self.receiver_index_size = max_receiver + 1
         self.entry_count = count
         self._len = sender_count
 
@@ -215,47 +264,54 @@ cdef class LocationStore:
         return self._items
 
     # specialized accessors
+    cdef size_t _find_item_start(self, ap_player_t receiver, ap_id_t item) noexcept nogil:
+        # binary search for the first receiver entry of item, returns the end of the receiver's range if there is none
+        cdef size_t l = self.receiver_index[receiver].start
+        cdef size_t r = l + self.receiver_index[receiver].count
+        cdef size_t m
+        while l < r:
+            m = (l + r) // 2
+            if self.receiver_entries[m].item < item:
+                l = m + 1
+            else:
+                r = m
+        return l
+
     def find_item(self, slots: Set[int], seeked_item_id: int) -> Generator[Tuple[int, int, int, int, int], None, None]:
         cdef ap_id_t item = seeked_item_id
         cdef ap_player_t receiver
-        cdef ap_player_set* receivers
-        cdef size_t slot_count = len(slots)
-        if slot_count == 1:
-            # specialized implementation for single slot
-            receiver = list(slots)[0]
-            with nogil:
-                for entry in self.entries[:self.entry_count]:
-                    if entry.item == item and entry.receiver == receiver:
-                        with gil:
-                            yield entry.sender, entry.location, entry.item, entry.receiver, entry.flags
-        elif slot_count:
-            # generic implementation with lookup in set
-            receivers = ap_player_set_new(min(1023, slot_count))  # limit top level struct to 16KB
-            if not receivers:
-                raise MemoryError()
-            try:
-                for receiver in slots:
-                    if not ap_player_set_add(receivers, receiver):
-                        raise MemoryError()
-                with nogil:
-                    for entry in self.entries[:self.entry_count]:
-                        if entry.item == item and ap_player_set_contains(receivers, entry.receiver):
-                            with gil:
-                                yield entry.sender, entry.location, entry.item, entry.receiver, entry.flags
-            finally:
-                ap_player_set_free(receivers)
+        cdef size_t i
+        cdef size_t end
+        cdef LocationEntry* entry
+        for slot in sorted(slots):
+            if slot < 1 or slot >= self.receiver_index_size:
+                continue
+            receiver = slot
+            end = self.receiver_index[receiver].start + self.receiver_index[receiver].count
+            i = self._find_item_start(receiver, item)
+            while i < end and self.receiver_entries[i].item == item:
+                entry = self.entries + self.receiver_entries[i].entry
+                yield entry.sender, entry.location, entry.item, entry.receiver, entry.flags
+                i += 1
 
     def get_for_player(self, slot: int) -> Dict[int, Set[int]]:
-        cdef ap_player_t receiver = slot
+        cdef ap_player_t receiver
+        cdef size_t start
+        cdef size_t count
+        cdef ReceiverEntry receiver_entry
+        cdef LocationEntry* entry
         all_locations: Dict[int, Set[int]] = {}
-        with nogil:
-            for entry in self.entries[:self.entry_count]:
-                if entry.receiver == receiver:
-                    with gil:
-                        sender: int = entry.sender
-                        if sender not in all_locations:
-                            all_locations[sender] = set()
-                        all_locations[sender].add(entry.location)
+        if slot < 1 or slot >= self.receiver_index_size:
+            return all_locations
+        receiver = slot
+        start = self.receiver_index[receiver].start
+        count = self.receiver_index[receiver].count
+        for receiver_entry in self.receiver_entries[start:start+count]:
+            entry = self.entries + receiver_entry.entry
+            sender: int = entry.sender
+            if sender not in all_locations:
+                all_locations[sender] = set()
+            all_locations[sender].add(entry.location)
         return all_locations
 
     def get_checked(self, state: State, team: int, slot: int) -> List[int]:
@@ -16,7 +16,8 @@ class EntranceRandomizationError(RuntimeError):
 
 class EntranceLookup:
     class GroupLookup:
-        _lookup: dict[int, list[Entrance]]
+        _lookup: dict[int, dict[Entrance, None]]
+        """group -> the entrances of the group, in order, as the keys of a dict so that they can be removed in O(1)"""
 
         def __init__(self):
             self._lookup = {}
@@ -28,27 +29,37 @@ class EntranceLookup:
             return bool(self._lookup)
 
         def __getitem__(self, item: int) -> list[Entrance]:
-            return self._lookup.get(item, [])
+            return list(self._lookup.get(item, ()))
 
         def __iter__(self):
             return itertools.chain.from_iterable(self._lookup.values())
 
+        def __contains__(self, entrance: Entrance) -> bool:
+            return entrance in self._lookup.get(entrance.randomization_group, ())
+
         def __repr__(self):
-            return str(self._lookup)
+            return str({group: list(entrances) for group, entrances in self._lookup.items()})
 
         def add(self, entrance: Entrance) -> None:
-            self._lookup.setdefault(entrance.randomization_group, []).append(entrance)
+            self._lookup.setdefault(entrance.randomization_group, {})[entrance] = None
 
         def remove(self, entrance: Entrance) -> None:
             group = self._lookup[entrance.randomization_group]
-            group.remove(entrance)
+            del group[entrance]
             if not group:
                 del self._lookup[entrance.randomization_group]
 
+        def shuffle(self, group: int, rng: random.Random) -> None:
+            entrances = self[group]
+            rng.shuffle(entrances)
+            if entrances:
+                self._lookup[group] = dict.fromkeys(entrances)
+
     dead_ends: GroupLookup
     others: GroupLookup
     _random: random.Random
     _expands_graph_cache: dict[Entrance, bool]
+    _region_expansion_cache: dict[Region, frozenset[str] | None]
     _coupled: bool
     _usable_exits: set[Entrance]
 
@@ -57,6 +68,7 @@ class EntranceLookup:
         self.others = EntranceLookup.GroupLookup()
         self._random = rng
         self._expands_graph_cache = {}
+        self._region_expansion_cache = {}
         self._coupled = coupled
         self._usable_exits = usable_exits
         for target in targets:
@@ -74,40 +86,56 @@ class EntranceLookup:
         if entrance in self._expands_graph_cache:
             return self._expands_graph_cache[entrance]
 
-        seen = {entrance.connected_region}
+        exit_names = self._find_expansion(entrance.connected_region)
+        # randomizable exits which are not reverse of the incoming entrance.
+        # uncoupled mode is an exception because in this case going back in the door you just came in could
+        # actually lead somewhere new
+        expands = exit_names is None or any(not self._coupled or name != entrance.name for name in exit_names)
+        self._expands_graph_cache[entrance] = expands
+        return expands
+
+    def _find_expansion(self, start: Region) -> frozenset[str] | None:
+        """
+        Searches the region graph from a region for progression or randomizable exits. The result is shared by all
+        targets into the same region, until the graph is changed.
+
+        :param start: The region to search from
+        :returns: None if progression was found, otherwise the names of up to 2 randomizable exits that were found,
+                  which is enough to know if there is one which is not the reverse of a given target
+        """
+        if start in self._region_expansion_cache:
+            return self._region_expansion_cache[start]
+
+        exit_names: set[str] = set()
+        seen = {start}
         q: deque[Region] = deque()
-        q.append(entrance.connected_region)
+        q.append(start)
 
-        while q:
+        while q and len(exit_names) < 2:
             region = q.popleft()
 
             # check if the region itself is progression
             if region in region.multiworld.indirect_connections:
-                self._expands_graph_cache[entrance] = True
-                return True
+                self._region_expansion_cache[start] = None
+                return None
 
             # check if any placed locations are progression
             for loc in region.locations:
                 if loc.advancement:
-                    self._expands_graph_cache[entrance] = True
-                    return True
+                    self._region_expansion_cache[start] = None
+                    return None
 
             # check if there is a randomized exit out (expands the graph directly) or else search any connected
             # regions to see if they are/have progression
             for exit_ in region.exits:
-                # randomizable exits which are not reverse of the incoming entrance.
-                # uncoupled mode is an exception because in this case going back in the door you just came in could
-                # actually lead somewhere new
-                if (not exit_.connected_region and (not self._coupled or exit_.name != entrance.name)
-                        and exit_ in self._usable_exits):
-                    self._expands_graph_cache[entrance] = True
-                    return True
+                if not exit_.connected_region and exit_ in self._usable_exits:
+                    exit_names.add(exit_.name)
                 elif exit_.connected_region and exit_.connected_region not in seen:
                     seen.add(exit_.connected_region)
                     q.append(exit_.connected_region)
 
-        self._expands_graph_cache[entrance] = False
-        return False
+        self._region_expansion_cache[start] = frozenset(exit_names)
+        return self._region_expansion_cache[start]
 
     def add(self, entrance: Entrance) -> None:
         lookup = self.others if self._can_expand_graph(entrance) else self.dead_ends
@@ -116,6 +144,8 @@ class EntranceLookup:
     def remove(self, entrance: Entrance) -> None:
         lookup = self.others if self._can_expand_graph(entrance) else self.dead_ends
         lookup.remove(entrance)
+        # targets are removed when they are connected, which changes the region graph
+        self._region_expansion_cache.clear()
 
     def get_targets(
             self,
@@ -134,7 +164,7 @@ class EntranceLookup:
         lookup = self.dead_ends if dead_end else self.others
         if preserve_group_order:
             for group in groups:
-                self._random.shuffle(lookup[group])
+                lookup.shuffle(group, self._random)
             ret = [entrance for group in groups for entrance in lookup[group]]
         else:
             ret = [entrance for group in groups for entrance in lookup[group]]
@@ -180,6 +210,11 @@ class ERPlacementState:
     """A lookup table of all unconnected ER targets"""
     coupled: bool
     """Whether entrance randomization is operating in coupled mode"""
+    _reachable_exits: set[Entrance]
+    """
+    Exits with the default is_valid_source_transition and can_reach that were reachable. The collection state only grows
+    during randomization, so they stay reachable and do not need to be checked again.
+    """
 
     def __init__(self, world: World, entrance_lookup: EntranceLookup, coupled: bool):
         self.placements = []
@@ -188,6 +223,7 @@ class ERPlacementState:
         self.coupled = coupled
         self.collection_state = world.multiworld.get_all_state(False, True)
         self.entrance_lookup = entrance_lookup
+        self._reachable_exits = set()
 
     @property
     def placed_regions(self) -> set[Region]:
@@ -199,13 +235,24 @@ class ERPlacementState:
             placeable_randomized_exits = [ex for ex in usable_exits
                                           if not ex.connected_region
                                           and ex in blocked_connections
-                                          and ex.is_valid_source_transition(self)]
+                                          and self._is_valid_source_transition(ex)]
         else:
             # this is on a beaten minimal attempt, so any exit anywhere is fair game
             placeable_randomized_exits = [ex for ex in usable_exits if not ex.connected_region]
         self.world.random.shuffle(placeable_randomized_exits)
         return placeable_randomized_exits
 
+    def _is_valid_source_transition(self, source_exit: Entrance) -> bool:
+        if source_exit in self._reachable_exits:
+            return True
+        valid = source_exit.is_valid_source_transition(self)
+        # only the default implementations are known to stay valid once the exit was reachable
+        entrance_type = type(source_exit)
+        if valid and entrance_type.is_valid_source_transition is Entrance.is_valid_source_transition \
+                and entrance_type.can_reach is Entrance.can_reach:
+            self._reachable_exits.add(source_exit)
+        return valid
+
     def _connect_one_way(self, source_exit: Entrance, target_entrance: Entrance) -> None:
         target_region = target_entrance.connected_region
 
@@ -598,12 +598,19 @@ class ServerOptions(Group):
         OFF = 0
         ON = 1
 
+    class Metrics(Bool):
+        """Collect metrics of client commands, traffic, event loop lag and saves, shown by the /metrics command"""
+
+    class MetricsPort(int):
+        """Serve the metrics in the Prometheus text format on this port of localhost, 0 to disable"""
+
     host: str | None = None
     port: int = 38281
     password: str | None = None
     multidata: str | None = None
     savefile: str | None = None
     disable_save: bool = False
+    save_journal: bool = False
     loglevel: str = "info"
     logtime: bool = False
     server_password: ServerPassword | None = None
@@ -616,6 +623,8 @@ class ServerOptions(Group):
     auto_shutdown: AutoShutdown = AutoShutdown(0)
     compatibility: Compatibility = Compatibility(2)
     log_network: LogNetwork = LogNetwork(0)
+    metrics: Metrics | bool = False
+    metrics_port: MetricsPort = MetricsPort(0)
 
 
 class GeneratorOptions(Group):
@@ -675,6 +684,12 @@ class GeneratorOptions(Group):
         start_inventory -> Move remaining items to start_inventory, generate additional filler items to fill locations.
         """
 
+    class StoreCompressedOutputs(Bool):
+        """
+        Store output files that are already zip archives, such as most patch files, in the final archive as they are,
+        instead of compressing them again
+        """
+
     enemizer_path: EnemizerPath = EnemizerPath("EnemizerCLI/EnemizerCLI.Core")  # + ".exe" is implied on Windows
     player_files_path: PlayerFilesPath = PlayerFilesPath("Players")
     players: Players = Players(0)
@@ -684,6 +699,7 @@ class GeneratorOptions(Group):
     race: Race = Race(0)
     plando_options: PlandoOptions = PlandoOptions("bosses, connections, texts")
     panic_method: PanicMethod = PanicMethod("swap")
+    store_compressed_outputs: StoreCompressedOutputs | bool = True
     loglevel: str = "info"
     logtime: bool = False
 
@@ -5,3 +5,11 @@ if __name__ == "__main__":
     load_worlds.run_load_worlds_benchmark()
     import locations
     locations.run_locations_benchmark()
+    import location_store
+    location_store.run_location_store_benchmark()
+    import encode
+    encode.run_encode_benchmark()
+    import restrictive_fill
+    restrictive_fill.run_restrictive_fill_benchmark()
+    import entrance_randomization
+    entrance_randomization.run_entrance_randomization_benchmark()
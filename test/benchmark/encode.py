@@ -0,0 +1,53 @@
+def run_encode_benchmark(events_per_message: int = 140):
+    import logging
+    import typing
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    import NetUtils
+    from NetUtils import NetworkItem
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        encode_iterations: int = 1_000
+
+        def __init__(self):
+            # a chunk of send events, like register_location_checks broadcasts during a release
+            self.msgs: typing.List[dict] = [{
+                "cmd": "PrintJSON",
+                "type": "ItemSend",
+                "receiving": 2,
+                "item": NetworkItem(1000 + i, 2000 + i, 1, 0b001),
+                "data": [
+                    {"text": "1", "type": "player_id"},
+                    {"text": " sent "},
+                    {"text": str(1000 + i), "player": 2, "flags": 0b001, "type": "item_id"},
+                    {"text": " to "},
+                    {"text": "2", "type": "player_id"},
+                    {"text": " ("},
+                    {"text": str(2000 + i), "player": 1, "type": "location_id"},
+                    {"text": ")"},
+                ],
+            } for i in range(events_per_message)]
+
+        def encode_test(self, name: str, encode: typing.Callable[[typing.Any], str]) -> None:
+            with TimeIt(f"{self.encode_iterations} messages of {events_per_message} events with {name}", logger) as t:
+                for _ in range(self.encode_iterations):
+                    encode(self.msgs)
+            logger.info(f"{self.encode_iterations / t.dif:.0f} messages/sec with {name}.")
+
+        def main(self):
+            self.encode_test("scan and json", lambda obj: NetUtils._encode(NetUtils._scan_for_TypedTuples(obj)))
+            self.encode_test("NetUtils.encode", NetUtils.encode)
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_encode_benchmark()
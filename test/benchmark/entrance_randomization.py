@@ -0,0 +1,69 @@
+def run_entrance_randomization_benchmark(grid_side_lengths=(16,)):
+    import argparse
+    import logging
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from BaseClasses import CollectionState, EntranceType, Location, MultiWorld, Region
+    from worlds.generic import GenericWorld
+    from entrance_rando import randomize_entrances
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    # each group connects to the opposite direction
+    target_group_lookup = {1: [2], 2: [1], 3: [4], 4: [3]}
+
+    class BenchmarkRunner:
+        def setup(self, side_length: int) -> MultiWorld:
+            """
+            A grid of regions with a location each, where Menu leads to the top left region, and each region has a
+            2-way entrance to its neighbours, all disconnected for randomization.
+            A grid with side_length n has 4 * n * (n - 1) exits, so 960 for the default 16x16 grid.
+            """
+            multiworld = MultiWorld(1)
+            multiworld.game = {1: GenericWorld.game}
+            multiworld.player_name = {1: "Tester"}
+            multiworld.set_seed(0)
+            args = argparse.Namespace()
+            for name, option in GenericWorld.options_dataclass.type_hints.items():
+                setattr(args, name, {1: option.from_any(option.default)})
+            multiworld.set_options(args)
+            multiworld.state = CollectionState(multiworld)
+            menu = Region("Menu", 1, multiworld)
+            multiworld.regions.append(menu)
+            for row in range(side_length):
+                for col in range(side_length):
+                    region = Region(f"Region {row}-{col}", 1, multiworld)
+                    multiworld.regions.append(region)
+                    region.locations.append(Location(1, f"Location {row}-{col}", None, region))
+                    if row == 0 and col == 0:
+                        menu.connect(region)
+                    for suffix, group, present in (("left", 1, col != 0), ("right", 2, col != side_length - 1),
+                                                   ("top", 3, row != 0), ("bottom", 4, row != side_length - 1)):
+                        if present:
+                            exit_ = region.create_exit(f"{region.name} {suffix}")
+                            target = region.create_er_target(f"{region.name} {suffix}")
+                            for entrance in (exit_, target):
+                                entrance.randomization_group = group
+                                entrance.randomization_type = EntranceType.TWO_WAY
+            return multiworld
+
+        def main(self):
+            for side_length in grid_side_lengths:
+                for coupled in (True, False):
+                    multiworld = self.setup(side_length)
+                    mode = "coupled" if coupled else "uncoupled"
+                    with TimeIt(f"{mode} randomize_entrances of a {side_length}x{side_length} grid", logger):
+                        er_state = randomize_entrances(multiworld.worlds[1], coupled, target_group_lookup)
+                    logger.info(f"{len(er_state.pairings)} entrances placed.")
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_entrance_randomization_benchmark()
@@ -0,0 +1,64 @@
+def run_location_store_benchmark(players: int = 1000, locations_per_player: int = 100, items_per_game: int = 500):
+    import logging
+    import random
+    import typing
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from NetUtils import LocationStore, _LocationStore
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        lookup_iterations: int = 1_000
+
+        def __init__(self):
+            rng = random.Random(0)
+            self.locations: typing.Dict[int, typing.Dict[int, typing.Tuple[int, int, int]]] = {
+                sender: {
+                    location: (rng.randrange(items_per_game), rng.randrange(1, players + 1), 0)
+                    for location in range(locations_per_player)
+                } for sender in range(1, players + 1)
+            }
+            self.rng = rng
+
+        def scan_find_item(self, slots: typing.Set[int], seeked_item_id: int) -> int:
+            # the full scan every find_item did before LocationStore had a receiver index
+            found = 0
+            for check_data in self.locations.values():
+                for item_id, receiving_player, _ in check_data.values():
+                    if receiving_player in slots and item_id == seeked_item_id:
+                        found += 1
+            return found
+
+        def lookup_test(self, name: str, find_item: typing.Callable[[typing.Set[int], int], typing.Any],
+                        iterations: int) -> None:
+            queries = [({self.rng.randrange(1, players + 1)}, self.rng.randrange(items_per_game))
+                       for _ in range(iterations)]
+            with TimeIt(f"{iterations} find_item with {name}", logger) as t:
+                for slots, item in queries:
+                    find_item(slots, item)
+            logger.info(f"{iterations / t.dif:.0f} hints/sec with {name}.")
+
+        def main(self):
+            logger.info(f"{players} players with {locations_per_player} locations each.")
+            self.lookup_test("full scan", self.scan_find_item, self.lookup_iterations // 100)
+            for store_type in dict.fromkeys((_LocationStore, LocationStore)):
+                with TimeIt(f"{store_type.__module__}.{store_type.__name__} construction", logger):
+                    store = store_type(self.locations)
+                if hasattr(store, "get_size"):
+                    logger.info(f"{store.get_size() / 1024:.0f} KiB used by {store_type.__module__} store.")
+                self.lookup_test(f"{store_type.__module__} index",
+                                 lambda slots, item: sum(1 for _ in store.find_item(slots, item)),
+                                 self.lookup_iterations)
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_location_store_benchmark()
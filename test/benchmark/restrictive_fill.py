@@ -0,0 +1,63 @@
+def run_restrictive_fill_benchmark(region_counts=(250, 1000), locations_per_region: int = 20):
+    import argparse
+    import logging
+    import typing
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from BaseClasses import CollectionState, Item, ItemClassification, Location, MultiWorld, Region
+    from worlds.generic import GenericWorld
+    from Fill import fill_restrictive
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        def setup(self, regions: int) -> typing.Tuple[MultiWorld, typing.List[Location], typing.List[Item]]:
+            """
+            A chain of regions, each locked behind the key of the previous one, with the deepest locations listed
+            first. Late in the fill, few keys are left to be collected, so most locations are unreachable and all of
+            them were scanned for every item before.
+            """
+            multiworld = MultiWorld(1)
+            multiworld.game = {1: GenericWorld.game}
+            multiworld.player_name = {1: "Tester"}
+            multiworld.set_seed(0)
+            args = argparse.Namespace()
+            for name, option in GenericWorld.options_dataclass.type_hints.items():
+                setattr(args, name, {1: option.from_any(option.default)})
+            multiworld.set_options(args)
+            multiworld.state = CollectionState(multiworld)
+            previous = Region("Menu", 1, multiworld)
+            multiworld.regions.append(previous)
+            previous.locations += [Location(1, f"Menu Location {j}", None, previous)
+                                   for j in range(locations_per_region)]
+            locations: typing.List[Location] = list(previous.locations)
+            items: typing.List[Item] = []
+            for i in range(regions):
+                region = Region(f"Region {i}", 1, multiworld)
+                multiworld.regions.append(region)
+                previous.connect(region, rule=lambda state, key=f"Key {i}": state.has(key, 1))
+                region.locations += [Location(1, f"Location {i}-{j}", None, region)
+                                     for j in range(locations_per_region)]
+                locations[:0] = region.locations
+                items.append(Item(f"Key {i}", ItemClassification.progression, None, 1))
+                previous = region
+            return multiworld, locations, items
+
+        def main(self):
+            for regions in region_counts:
+                multiworld, locations, items = self.setup(regions)
+                with TimeIt(f"fill_restrictive of {len(items)} items into {len(locations)} locations", logger) as t:
+                    fill_restrictive(multiworld, multiworld.state, locations, items, single_player_placement=True)
+                logger.info(f"{regions / t.dif:.0f} items/sec placed with {regions} regions.")
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_restrictive_fill_benchmark()
@@ -123,6 +123,26 @@ class TestEntranceLookup(unittest.TestCase):
         self.assertTrue(dead_end in lookup.dead_ends)
         self.assertEqual(len(lookup.dead_ends), 1)
 
+    def test_dead_ends_into_same_region(self):
+        """test that targets into the same region are only dead ends if the region's exits are their reverse"""
+        multiworld = generate_test_multiworld()
+        generate_disconnected_region_grid(multiworld, 5)
+        exits_set = set([ex for region in multiworld.get_regions(1)
+                         for ex in region.exits if not ex.connected_region and ex.name != "region20_right"])
+
+        er_targets = [entrance for region in multiworld.get_regions(1)
+                      for entrance in region.entrances if not entrance.parent_region]
+        lookup = EntranceLookup(multiworld.worlds[1].random, coupled=True, usable_exits=exits_set, targets=er_targets)
+        # region 20 can only be left through its top exit, which is the reverse of its top entrance
+        top = lookup.find_target("region20_top")
+        right = lookup.find_target("region20_right")
+        self.assertEqual(top.connected_region, right.connected_region)
+        self.assertIn(top, lookup.dead_ends)
+        self.assertIn(right, lookup.others)
+        lookup.remove(top)
+        self.assertNotIn(top, lookup.dead_ends)
+        self.assertEqual(len(lookup.dead_ends), 0)
+
     def test_find_target_by_name(self):
         """Tests that find_target can find the correct target by name only"""
         multiworld = generate_test_multiworld()
@@ -271,6 +291,35 @@ class TestDisconnectForRandomization(unittest.TestCase):
         self.assertEqual(2, r2.entrances[0].randomization_group)
 
 
+class TestERPlacementState(unittest.TestCase):
+    def create_state(self, region_creator=Region) -> ERPlacementState:
+        multiworld = generate_test_multiworld()
+        generate_disconnected_region_grid(multiworld, 2, region_creator=region_creator)
+        lookup = EntranceLookup(multiworld.worlds[1].random, coupled=True, usable_exits=set(), targets=[])
+        return ERPlacementState(multiworld.worlds[1], lookup, coupled=True)
+
+    def test_reachable_exits_are_remembered(self):
+        """tests that valid source exits with the default implementations are not checked again"""
+        er_state = self.create_state()
+        source_exit = er_state.world.get_entrance("region0_right")
+        self.assertTrue(er_state._is_valid_source_transition(source_exit))
+        self.assertIn(source_exit, er_state._reachable_exits)
+
+    def test_custom_can_reach_is_checked_again(self):
+        """tests that exits overriding can_reach are checked every time"""
+        class CustomEntrance(Entrance):
+            def can_reach(self, state) -> bool:
+                return super().can_reach(state)
+
+        class CustomRegion(Region):
+            entrance_type = CustomEntrance
+
+        er_state = self.create_state(CustomRegion)
+        source_exit = er_state.world.get_entrance("region0_right")
+        self.assertTrue(er_state._is_valid_source_transition(source_exit))
+        self.assertNotIn(source_exit, er_state._reachable_exits)
+
+
 class TestRandomizeEntrances(unittest.TestCase):
     def test_determinism(self):
         """tests that the same output is produced for the same input"""
@@ -0,0 +1,96 @@
+import unittest
+
+from BaseClasses import CollectionState, Item, ItemClassification, Region
+from worlds.generic.Rules import (And, CanReach, Custom, Has, HasAll, HasAny, HasGroup, Or, Rule, add_rule,
+                                  compile_rule, get_rule, set_rule)
+from . import generate_test_multiworld
+
+
+class TestRules(unittest.TestCase):
+    def setUp(self) -> None:
+        self.multiworld = generate_test_multiworld()
+        self.multiworld.worlds[1].item_name_groups = {"Weapons": frozenset({"Sword", "Bow"})}
+        self.menu = self.multiworld.get_region("Menu", 1)
+        self.dungeon = Region("Dungeon", 1, self.multiworld)
+        self.multiworld.regions.append(self.dungeon)
+        self.entrance = self.menu.connect(self.dungeon, "Dungeon Door")
+        self.state = CollectionState(self.multiworld)
+
+    def collect(self, *names: str) -> None:
+        for name in names:
+            self.state.collect(Item(name, ItemClassification.progression, None, 1), True)
+
+    def test_evaluation(self) -> None:
+        """Compiled rules evaluate like their CollectionState counterparts."""
+        rules = {
+            "has": Has("Sword", 1),
+            "has count": Has("Sword", 1, 2),
+            "has all": HasAll(["Sword", "Shield"], 1),
+            "has any": HasAny(["Bow", "Shield"], 1),
+            "group": HasGroup("Weapons", 1, 2),
+            "group unique": HasGroup("Weapons", 1, 2, unique=True),
+            "and": Has("Sword", 1) & Has("Shield", 1),
+            "or": Has("Bow", 1) | Has("Shield", 1),
+        }
+        expected_before = {name: False for name in rules}
+        expected_after = {"has": True, "has count": True, "has all": True, "has any": True, "group": True,
+                          "group unique": False, "and": True, "or": True}
+        for expected in (expected_before, expected_after):
+            for name, rule in rules.items():
+                with self.subTest(name, expected=expected[name]):
+                    self.assertEqual(compile_rule(rule)(self.state), expected[name])
+                    self.assertEqual(rule(self.state), expected[name])
+            self.collect("Sword", "Sword", "Shield")
+
+    def test_can_reach(self) -> None:
+        set_rule(self.entrance, Has("Key", 1))
+        rule = CanReach("Dungeon", 1)
+        self.assertFalse(rule(self.state))
+        self.collect("Key")
+        self.assertTrue(rule(self.state))
+
+    def test_flattening(self) -> None:
+        """add_rule combines into a single rule, with the newest rule evaluated first."""
+        calls = []
+
+        def first(state):
+            calls.append("first")
+            return True
+
+        def second(state):
+            calls.append("second")
+            return True
+
+        set_rule(self.entrance, first)
+        add_rule(self.entrance, second)
+        add_rule(self.entrance, Has("Key", 1))
+        self.assertEqual(get_rule(self.entrance), And(Has("Key", 1), Custom(second), Custom(first)))
+        self.assertNotIn("evaluator", vars(get_rule(self.entrance)), "add_rule should leave compiling to evaluation")
+        self.assertFalse(self.entrance.access_rule(self.state))
+        self.assertEqual(calls, [])
+
+        self.collect("Key")
+        self.assertTrue(self.entrance.access_rule(self.state))
+        self.assertEqual(calls, ["second", "first"])
+
+        add_rule(self.entrance, Has("Shield", 1), "or")
+        self.assertEqual(get_rule(self.entrance),
+                         Or(Has("Shield", 1), And(Has("Key", 1), Custom(second), Custom(first))))
+
+    def test_introspection(self) -> None:
+        rule = (Has("Key", 1) & HasGroup("Weapons", 1)) | (HasAny(["Gem"], 2) & CanReach("Dungeon", 1))
+        self.assertEqual(rule.item_dependencies(self.multiworld), {1: {"Key", "Sword", "Bow"}, 2: {"Gem"}})
+        self.assertEqual(rule.region_dependencies(), {("Dungeon", 1)})
+        self.assertIsNone(get_rule(self.entrance))
+
+    def test_compile_cache(self) -> None:
+        """Equal single rules share one evaluator, combinations are compiled for each use."""
+        self.assertIs(compile_rule(Has("Key", 1, 2)), compile_rule(Has("Key", 1, 2)))
+        self.assertIsNot(compile_rule(Has("Key", 1, 2)), compile_rule(Has("Key", 1, 3)))
+        rule = Has("Key", 1) & Has("Sword", 1, 2)
+        self.assertIsNot(compile_rule(rule), compile_rule(rule))
+
+    def test_abstract(self) -> None:
+        with self.assertRaises(TypeError):
+            Rule()
+
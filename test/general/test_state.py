@@ -1,7 +1,9 @@
 import unittest
+from collections import Counter
 
+from BaseClasses import CollectionState, Item, ItemClassification, Location, Region, _SphereSearch
 from worlds.AutoWorld import AutoWorldRegister, call_all
-from . import setup_solo_multiworld
+from . import generate_test_multiworld, setup_solo_multiworld
 
 
 class TestBase(unittest.TestCase):
@@ -27,3 +29,72 @@ class TestBase(unittest.TestCase):
                     with self.subTest("Step", step=step):
                         call_all(multiworld, step)
                         self.assertTrue(multiworld.get_all_state(False, allow_partial_entrances=True))
+
+
+class TestSphereSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.multiworld = generate_test_multiworld()
+        self.menu = self.multiworld.get_region("Menu", 1)
+        self.cave = Region("Cave", 1, self.multiworld)
+        self.multiworld.regions.append(self.cave)
+        self.menu.connect(self.cave, "Cave Entrance", lambda state: state.has("Lamp", 1))
+        self.evaluations = Counter()
+
+        def add_location(region, name, item, rule, address=None):
+            location = Location(1, name, address, region)
+            region.locations.append(location)
+            code = None if address is None else address
+
+            def counting(state):
+                self.evaluations[name] += 1
+                return rule(state)
+            location.access_rule = counting
+            location.place_locked_item(Item(item, ItemClassification.progression, code, 1))
+
+        add_location(self.menu, "Chest", "Lamp", lambda state: True, 1)
+        add_location(self.menu, "Locked Chest", "Sword", lambda state: state.has("Key", 1), 2)
+        add_location(self.menu, "Boss", "Victory", lambda state: state.has("Sword", 1))
+        add_location(self.cave, "Cave Chest", "Key", lambda state: True, 3)
+        add_location(self.cave, "Unreachable Chest", "Shield", lambda state: state.has("Nothing", 1), 4)
+
+    def naive_spheres(self):
+        state = CollectionState(self.multiworld)
+        locations = set(self.multiworld.get_filled_locations())
+        while locations:
+            sphere = {location for location in locations if location.can_reach(state)}
+            yield sphere
+            if not sphere:
+                yield locations
+                break
+            for location in sphere:
+                state.collect(location.item, True, location)
+            locations -= sphere
+
+    def test_same_spheres(self) -> None:
+        """The indexed sphere search finds the same spheres as testing every location each sphere."""
+        expected = list(self.naive_spheres())
+        self.assertEqual(list(self.multiworld.get_spheres()), expected)
+        self.assertEqual([{location.name for location in sphere} for sphere in expected],
+                         [{"Chest"}, {"Cave Chest"}, {"Locked Chest"}, {"Boss"}, set(), {"Unreachable Chest"}])
+
+    def test_sendable_spheres_collect_events(self) -> None:
+        self.assertEqual([{location.name for location in sphere} for sphere in self.multiworld.get_sendable_spheres()],
+                         [{"Chest"}, {"Cave Chest"}, {"Locked Chest"}, set(), {"Unreachable Chest"}])
+
+    def test_unreachable_regions_skip_evaluation(self) -> None:
+        """Locations are only tested once their region is reachable and then again for every sphere."""
+        list(self.multiworld.get_spheres())
+        self.assertEqual(self.evaluations["Cave Chest"], 1)
+        self.assertEqual(self.evaluations["Unreachable Chest"], 4)
+
+    def test_items_added_outside_the_search(self) -> None:
+        """Items added to the state directly are found by the next sphere."""
+        state = CollectionState(self.multiworld)
+        search = _SphereSearch(state, self.multiworld.get_filled_locations())
+        sphere = search.next_sphere()
+        while sphere:
+            search.collect(sphere)
+            sphere = search.next_sphere()
+        state.add_item("Nothing", 1)
+        self.assertEqual({location.name for location in search.next_sphere()}, {"Unreachable Chest"})
+        self.assertEqual(self.evaluations["Unreachable Chest"], 5)
@@ -0,0 +1,40 @@
+# Tests for NetUtils.encode
+import json
+import unittest
+from unittest import mock
+
+import NetUtils
+from NetUtils import Hint, HintStatus, NetworkItem, NetworkPlayer, NetworkSlot, SlotType, decode, encode
+
+sample_msgs = [
+    {"cmd": "PrintJSON", "type": "ItemSend", "receiving": 2, "item": NetworkItem(21, 11, 1, 0b001),
+     "data": [{"text": "Player1", "type": "player_id"}, {"text": " found ü "}]},
+    {"cmd": "Connected", "players": [NetworkPlayer(0, 1, "Alias", "Player1")],
+     "slot_info": {1: NetworkSlot("Player1", "Game", SlotType.player)},
+     "checked_locations": {11, 12}, "hints": frozenset({Hint(2, 1, 11, 21, False, status=HintStatus.HINT_PRIORITY)})},
+    {"cmd": "SetReply", "key": "big", "value": 1 << 80},
+]
+
+
+class TestEncode(unittest.TestCase):
+    def test_matches_json_encoding(self) -> None:
+        for msg in sample_msgs:
+            self.assertEqual(json.loads(encode([msg])),
+                             json.loads(NetUtils._encode(NetUtils._scan_for_TypedTuples([msg]))))
+
+    def test_round_trip(self) -> None:
+        decoded = decode(encode(sample_msgs))
+        self.assertEqual(decoded[0]["item"], NetworkItem(21, 11, 1, 0b001))
+        self.assertEqual(decoded[1]["players"][0], NetworkPlayer(0, 1, "Alias", "Player1"))
+        self.assertEqual(decoded[1]["slot_info"]["1"].name, "Player1")
+        self.assertEqual(sorted(decoded[1]["checked_locations"]), [11, 12])
+        self.assertEqual(decoded[2]["value"], 1 << 80)
+
+    def test_without_orjson(self) -> None:
+        with mock.patch.object(NetUtils, "orjson", None):
+            self.assertEqual(json.loads(encode(sample_msgs)),
+                             json.loads(NetUtils._encode(NetUtils._scan_for_TypedTuples(sample_msgs))))
+
+    def test_unknown_type(self) -> None:
+        with self.assertRaises(TypeError):
+            encode([{"cmd": "Bounced", "data": object()}])
@@ -223,6 +223,30 @@ class Base:
                 self.assertEqual(store.get_remaining(empty_state, 0, 1), [])
                 self.assertEqual(store.get_remaining(full_state, 0, 1), [])
 
+        def test_receiver_index(self) -> None:
+            import random
+            rng = random.Random(0)
+            data: RawLocations = {
+                sender: {location: (rng.randrange(20), rng.randrange(1, 9), rng.randrange(4))
+                         for location in rng.sample(range(1000), 100)}
+                for sender in range(1, 9)
+            }
+            store = self.type(data)
+            for slots in ({1}, {2, 5}, set(range(10))):
+                for item in range(20):
+                    self.assertEqual(sorted(store.find_item(slots, item)), sorted(
+                        (sender, location, item, receiver, flags)
+                        for sender, locations in data.items()
+                        for location, (item_id, receiver, flags) in locations.items()
+                        if item_id == item and receiver in slots
+                    ))
+            for slot in range(10):
+                self.assertEqual(store.get_for_player(slot), {
+                    sender: {location for location, (_, receiver, _) in locations.items() if receiver == slot}
+                    for sender, locations in data.items()
+                    if any(receiver == slot for _, receiver, _ in locations.values())
+                })
+
         def test_no_locations_for_1(self) -> None:
             store = self.type({
                 1: {},
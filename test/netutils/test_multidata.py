@@ -0,0 +1,55 @@
+# Tests for NetUtils.dump_multidata and NetUtils.load_multidata
+import pickle
+import unittest
+import zlib
+from unittest import mock
+
+from NetUtils import LazyMultiData, NetworkSlot, SlotType, dump_multidata, load_multidata
+from Utils import VersionException
+
+sample_data = {
+    "slot_data": {1: {"goal": 1}, 2: {"goal": 2}},
+    "slot_info": {1: NetworkSlot("Player1", "Game", SlotType.player),
+                  2: NetworkSlot("Player2", "Game", SlotType.player)},
+    "locations": {1: {11: (21, 2, 0)}, 2: {21: (11, 1, 0)}},
+    "spheres": [{1: {11}}, {2: {21}}],
+    "datapackage": {"Game": {"checksum": "abc"}},
+    "seed_name": "12345",
+}
+
+
+class TestMultiData(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        data = dump_multidata(sample_data)
+        self.assertEqual(data[0], 4)
+        multidata = load_multidata(data)
+        self.assertIsInstance(multidata, LazyMultiData)
+        self.assertEqual(list(multidata), list(sample_data))
+        for key, value in sample_data.items():
+            with self.subTest(key=key):
+                self.assertEqual(dict(multidata[key]) if isinstance(value, dict) else multidata[key], value)
+
+    def test_lazy_sections(self) -> None:
+        """Only the sections that are accessed get unpickled."""
+        multidata = load_multidata(dump_multidata(sample_data))
+        with mock.patch("NetUtils.restricted_loads", wraps=pickle.loads) as loads:
+            self.assertEqual(multidata["seed_name"], "12345")
+            self.assertEqual(multidata["slot_data"][2], {"goal": 2})
+            self.assertEqual(multidata["slot_data"][2], {"goal": 2})
+        self.assertEqual(loads.call_count, 2)
+
+    def test_modification(self) -> None:
+        multidata = load_multidata(dump_multidata(sample_data))
+        del multidata["datapackage"]["Game"]
+        multidata["seed_name"] = "54321"
+        self.assertEqual(multidata.pop("locations"), sample_data["locations"])
+        reloaded = load_multidata(dump_multidata(multidata))
+        self.assertEqual(dict(reloaded["datapackage"]), {})
+        self.assertEqual(reloaded["seed_name"], "54321")
+        self.assertNotIn("locations", reloaded)
+
+    def test_legacy_format(self) -> None:
+        data = bytes([3]) + zlib.compress(pickle.dumps(sample_data))
+        self.assertEqual(load_multidata(data), sample_data)
+        with self.assertRaises(VersionException):
+            load_multidata(bytes([5]) + data[1:])
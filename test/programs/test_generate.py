@@ -137,3 +137,45 @@ class TestGenerateWeights(TestGenerateMain):
                     result, getattr(namespace, option_name)[player].value,
                     "Generated results from weights file did not match expected value."
                 )
+
+
+class TestWriteOutputFiles(unittest.TestCase):
+    def test_duplicate_names(self):
+        """Files of the same name from different output tasks are an error instead of two members of one name."""
+        import zipfile
+
+        with TemporaryDirectory() as temp_dir:
+            output_dirs = [Path(temp_dir, str(i)) for i in range(2)]
+            for output_dir in output_dirs:
+                output_dir.mkdir()
+                (output_dir / "AP_1_P1.txt").write_text(output_dir.name)
+            archives = [Main.compress_output_files(str(output_dir), True) for output_dir in output_dirs]
+            with zipfile.ZipFile(Path(temp_dir, "AP_1.zip"), "w") as zf:
+                Main.write_output_files(zf, archives[0])
+                with self.assertRaises(FileExistsError):
+                    Main.write_output_files(zf, archives[1])
+
+    def test_copy_compressed(self):
+        """The compressed files of output tasks end up in the archive as they were written."""
+        import io
+        import zipfile
+
+        with TemporaryDirectory() as temp_dir:
+            output_dirs = [Path(temp_dir, str(i)) for i in range(2)]
+            for i, output_dir in enumerate(output_dirs):
+                output_dir.mkdir()
+                (output_dir / f"AP_1_P{i}.txt").write_text(f"Player {i}\n" * 100)
+            patch = io.BytesIO()
+            with zipfile.ZipFile(patch, "w") as patch_zf:
+                patch_zf.writestr("patch.bin", bytes(100))
+            (output_dirs[1] / "AP_1_P1.patch").write_bytes(patch.getvalue())
+            with zipfile.ZipFile(Path(temp_dir, "AP_1.zip"), "w") as zf:
+                for output_dir in output_dirs:
+                    Main.write_output_files(zf, Main.compress_output_files(str(output_dir), True))
+            with zipfile.ZipFile(Path(temp_dir, "AP_1.zip")) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertEqual(zf.namelist(), ["AP_1_P0.txt", "AP_1_P1.patch", "AP_1_P1.txt"])
+                self.assertEqual(zf.getinfo("AP_1_P0.txt").compress_type, zipfile.ZIP_DEFLATED)
+                self.assertEqual(zf.getinfo("AP_1_P1.patch").compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(zf.read("AP_1_P0.txt"), b"Player 0\n" * 100)
+                self.assertEqual(zf.read("AP_1_P1.patch"), patch.getvalue())
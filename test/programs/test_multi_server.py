@@ -1,5 +1,11 @@
+import asyncio
+import os
+import tempfile
 import unittest
-from MultiServer import Context, ServerCommandProcessor
+from unittest import mock
+
+from MultiServer import Client, Context, ServerCommandProcessor, ServerMetrics, send_items_to, send_new_items
+from NetUtils import Endpoint, Hint, HintStatus, NetworkItem
 
 
 class TestResolvePlayerName(unittest.TestCase):
@@ -38,3 +44,196 @@ class TestResolvePlayerName(unittest.TestCase):
         assert p.resolve_player("ABC") == (1, 2, "abc"), "case insensitive resolves when 1 match"
         assert p.resolve_player("abcd") == (1, 3, "abCD"), "case insensitive resolves when 1 match"
         assert not p.resolve_player("aB"), "partial name shouldn't resolve to player"
+
+
+class TestSaveJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.ctx = self.create_context()
+
+    def create_context(self) -> Context:
+        with mock.patch.object(Context, "_load_game_data"):  # the data package is irrelevant to saving
+            ctx = Context("", 0, "", "", 0, 0, False)
+        ctx.connect_names = {"Player1": (0, 1)}
+        ctx.save_filename = os.path.join(self.directory.name, "test.apsave")
+        ctx.save_journal = True
+        return ctx
+
+    def play(self) -> None:
+        self.ctx.location_checks[0, 1].add(5)
+        self.ctx.record_save_change("location_checks", (0, 1), {5})
+        send_items_to(self.ctx, 0, 1, NetworkItem(10, 5, 1, 0))
+        self.ctx.stored_data["key"] = [1]
+        self.ctx.record_save_change("stored_data", "key", [1])
+        self.ctx.hints_used[0, 1] += 1
+
+    def test_replay(self) -> None:
+        """A save read back from snapshot and journal matches the state it was written from."""
+        hint = Hint(1, 1, 6, 10, False)
+        self.ctx.hints[0, 1].add(hint)
+        self.assertTrue(self.ctx._save())  # no snapshot yet, so this writes one
+        self.play()
+        self.ctx.replace_hint(0, 1, hint, hint._replace(status=HintStatus.HINT_PRIORITY))
+        self.assertTrue(self.ctx._save())
+        self.assertGreater(os.path.getsize(self.ctx.save_journal_filename), 0)
+        self.play()
+        self.ctx.stored_data["key"] = [1, 2]
+        self.ctx.record_save_change("stored_data", "key", [1, 2])
+        self.assertTrue(self.ctx._save())
+
+        expected = self.ctx.get_save()
+        loaded = self.create_context()
+        loaded.set_save(loaded._read_save())
+        actual = loaded.get_save()
+        for key in ("received_items", "location_checks", "stored_data", "hints", "hints_used", "random_state"):
+            self.assertEqual(actual[key], expected[key], key)
+        self.assertEqual(len(actual["received_items"][0, 1, True]), 2)
+
+    def test_compaction(self) -> None:
+        """Once the journal outgrows the snapshot, the next save writes a snapshot and empties the journal."""
+        self.ctx._save()
+        generation = self.ctx.save_journal_generation
+        while self.ctx.save_journal_size < self.ctx.save_snapshot_size:
+            self.play()
+            self.ctx._save()
+        self.ctx._save()
+        self.assertEqual(os.path.getsize(self.ctx.save_journal_filename), 0)
+        self.assertEqual(self.ctx.save_journal_generation, generation + 1)
+
+        loaded = self.create_context()
+        self.assertEqual(loaded._read_save()["received_items"], self.ctx.get_save()["received_items"])
+
+
+class TestSendNewItems(unittest.TestCase):
+    def test_sends_are_batched(self) -> None:
+        """Items sent within one event loop tick reach each client in a single ReceivedItems."""
+        with mock.patch.object(Context, "_load_game_data"):
+            ctx = Context("", 0, "", "", 0, 0, False)
+        sent: list = []
+
+        async def send_msgs(client, msgs) -> bool:
+            sent.append((client, msgs))
+            return True
+
+        async def main() -> None:
+            receiver = Client(None, ctx)
+            bystander = Client(None, ctx)
+            for client in (receiver, bystander):
+                client.items_handling = 0b111
+            ctx.clients = {0: {1: [receiver], 2: [bystander]}}
+            with mock.patch.object(ctx, "send_msgs", send_msgs):
+                for location in range(100):
+                    send_items_to(ctx, 0, 1, NetworkItem(1, location, 2, 0))
+                    send_new_items(ctx)
+                for _ in range(3):
+                    await asyncio.sleep(0)
+            self.assertEqual(len(sent), 1)
+            client, [msg] = sent[0]
+            self.assertIs(client, receiver)
+            self.assertEqual((msg["cmd"], msg["index"], len(msg["items"])), ("ReceivedItems", 0, 100))
+            self.assertEqual(receiver.send_index, 100)
+
+        asyncio.run(main())
+
+
+class TestGetSphere(unittest.TestCase):
+    def setUp(self) -> None:
+        with mock.patch.object(Context, "_load_game_data"):
+            self.ctx = Context("", 0, "", "", 0, 0, False)
+
+    def test_no_spheres(self) -> None:
+        self.assertEqual(self.ctx.get_sphere(1, 1), -1)
+        self.assertEqual(self.ctx.get_spheres_for(1, [1, 2]), [-1, -1])
+
+    def test_get_sphere(self) -> None:
+        self.ctx.spheres = [{1: {10, 3}}, {1: {7}, 2: {1}}, {2: {2, 100}}]
+        self.ctx._init_sphere_index()
+        self.assertEqual(self.ctx.get_sphere(1, 3), 0)
+        self.assertEqual(self.ctx.get_sphere(1, 7), 1)
+        self.assertEqual(self.ctx.get_sphere(2, 100), 2)
+        self.assertEqual(self.ctx.get_spheres_for(2, [100, 1, 2]), [2, 1, 2])
+        with self.assertRaises(KeyError):
+            self.ctx.get_sphere(1, 1)
+        with self.assertRaises(KeyError):
+            self.ctx.get_sphere(3, 1)
+
+
+class TestRecheckLocationHints(unittest.TestCase):
+    def test_only_hints_for_checked_location_update(self) -> None:
+        with mock.patch.object(Context, "_load_game_data"):
+            ctx = Context("", 0, "", "", 0, 0, False)
+        checked = Hint(2, 1, 5, 10, False)
+        unchecked = Hint(2, 1, 6, 11, False)
+        for slot in (1, 2):
+            ctx.hints[0, slot].update((checked, unchecked))
+        ctx._init_hint_index()
+
+        ctx.location_checks[0, 1].add(5)
+        changed: set = set()
+        ctx.recheck_location_hints(0, 1, {5}, changed)
+
+        found = checked._replace(found=True, status=HintStatus.HINT_FOUND)
+        self.assertEqual(changed, {(0, 1), (0, 2)})
+        for slot in (1, 2):
+            self.assertEqual(ctx.hints[0, slot], {found, unchecked})
+        self.assertNotIn((0, 1, 5), ctx.hint_index)
+        self.assertEqual(ctx.hint_index[0, 1, 6], {unchecked})
+
+
+class TestBroadcastTeam(unittest.TestCase):
+    def test_unrelated_item_sends_are_filtered(self) -> None:
+        """Clients tagged NoUnrelatedItemSends only get ItemSend messages concerning their slot."""
+        with mock.patch.object(Context, "_load_game_data"):
+            ctx = Context("", 0, "", "", 0, 0, False)
+        sent: dict = {}
+
+        async def send_encoded_msgs(client, msg) -> bool:
+            sent[client] = msg
+            return True
+
+        async def broadcast_send_encoded_msgs(clients, msg) -> bool:
+            for client in clients:
+                sent[client] = msg
+            return True
+
+        async def main() -> None:
+            clients = {slot: Client(None, ctx) for slot in (1, 2, 3)}
+            for slot, client in clients.items():
+                client.no_text = False
+                client.no_unrelated_item_sends = slot != 1
+            ctx.clients = {0: {slot: [client] for slot, client in clients.items()}}
+            msgs = [{"cmd": "PrintJSON", "type": "ItemSend", "receiving": 2, "item": NetworkItem(1, 1, 1)},
+                    {"cmd": "PrintJSON", "type": "ItemSend", "receiving": 1, "item": NetworkItem(2, 2, 1)}]
+            with mock.patch.object(ctx, "send_encoded_msgs", send_encoded_msgs), \
+                    mock.patch.object(ctx, "broadcast_send_encoded_msgs", broadcast_send_encoded_msgs):
+                ctx.broadcast_team(0, msgs)
+                await asyncio.sleep(0)
+            self.assertEqual(ctx.loader(sent[clients[1]]), msgs)
+            self.assertEqual(ctx.loader(sent[clients[2]]), msgs[:1])
+            self.assertNotIn(clients[3], sent)
+
+        asyncio.run(main())
+
+
+class TestServerMetrics(unittest.TestCase):
+    def test_render(self) -> None:
+        """Histogram buckets are cumulative and unknown commands are grouped together."""
+        metrics = ServerMetrics()
+        metrics.observe_command({"cmd": "Sync"}, 0.002)
+        metrics.observe_command({"cmd": "Sync"}, 10)
+        metrics.observe_command({"cmd": "NotACommand"}, 0.002)
+        metrics.observe_command("garbage", 0.002)
+        client = Endpoint(None)
+        client.auth, client.team, client.slot = True, 0, 3
+        metrics.count_received(client, 100)
+        metrics.count_sent(Endpoint(None), 20)
+
+        lines = metrics.render().splitlines()
+        self.assertIn('archipelago_command_seconds_bucket{cmd="Sync",le="0.001"} 0', lines)
+        self.assertIn('archipelago_command_seconds_bucket{cmd="Sync",le="0.0025"} 1', lines)
+        self.assertIn('archipelago_command_seconds_bucket{cmd="Sync",le="+Inf"} 2', lines)
+        self.assertIn('archipelago_command_seconds_count{cmd="other"} 2', lines)
+        self.assertIn('archipelago_received_bytes_total{team="0",slot="3"} 100', lines)
+        self.assertIn('archipelago_sent_bytes_total{team="",slot=""} 20', lines)
+        self.assertTrue(metrics.summary()[0].startswith("Sync: 2 processed"))
@@ -4,6 +4,22 @@ from uuid import uuid4
 
 from flask import Flask
 from flask.testing import FlaskClient
+from pony.orm.core import BindingError
+
+pony_config = {
+    "provider": "sqlite",
+    "filename": ":memory:",
+    "create_db": True,
+}
+
+
+def bind_db() -> None:
+    """Binds the database for tests that don't need the app, unless an earlier test bound it already."""
+    from WebHostLib.models import db
+
+    if db.provider is None:
+        db.bind(**pony_config)
+        db.generate_mapping(create_tables=True)
 
 
 class TestBase(unittest.TestCase):
@@ -15,11 +31,7 @@ class TestBase(unittest.TestCase):
         from WebHostLib import app as raw_app
         from WebHost import get_app
 
-        raw_app.config["PONY"] = {
-            "provider": "sqlite",
-            "filename": ":memory:",
-            "create_db": True,
-        }
+        raw_app.config["PONY"] = pony_config
         raw_app.config.update({
             "TESTING": True,
             "DEBUG": True,
@@ -31,6 +43,9 @@ class TestBase(unittest.TestCase):
             if "register_blueprint" not in e.args[0]:
                 raise
             cls.app = raw_app
+        except BindingError:
+            # the database was bound by a test without the app, see bind_db
+            cls.app = raw_app
 
     def setUp(self) -> None:
         self.client = self.app.test_client()
@@ -0,0 +1,107 @@
+import unittest
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from . import bind_db
+
+
+class TestRoomPoller(unittest.TestCase):
+    inactive_rooms = 10000
+    active_rooms = 10
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        from pony.orm import db_session
+        from WebHostLib.models import Room, Seed
+
+        bind_db()
+        cls.owner = uuid4()
+        now = datetime.utcnow()
+        with db_session:
+            seed = Seed(multidata=b"", owner=cls.owner)
+            cls.seed_id = seed.id
+            for i in range(cls.inactive_rooms):
+                # spread over a week, so that some are within the look back of the first poll but timed out
+                last_activity = now - timedelta(hours=3, days=7 * i / cls.inactive_rooms)
+                Room(seed=seed, owner=cls.owner, last_activity=last_activity)
+            cls.active = [Room(seed=seed, owner=cls.owner, last_activity=now - timedelta(minutes=1)).id
+                          for _ in range(cls.active_rooms)]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        from pony.orm import db_session
+        from WebHostLib.models import Room, Seed
+
+        with db_session:
+            Room.select(lambda room: room.owner == cls.owner).delete(bulk=True)
+            Seed[cls.seed_id].delete()
+
+    def setUp(self) -> None:
+        from pony.orm import db_session
+        from WebHostLib.models import Room
+
+        # rooms woken by an earlier test would be found again by the look back of the next poll
+        with db_session:
+            for room_id in self.active:
+                Room[room_id].last_activity = datetime.utcnow() - timedelta(minutes=1)
+
+    def poll(self, poller) -> set:
+        from pony.orm import db_session
+
+        with db_session:
+            return {room.id for room in poller.poll()}
+
+    def test_poll(self) -> None:
+        """The first poll finds the rooms within their timeout, later ones only rooms with new activity."""
+        from pony.orm import db_session
+        from WebHostLib.autolauncher import RoomPoller
+        from WebHostLib.models import Room
+
+        poller = RoomPoller()
+        self.assertEqual(self.poll(poller), set(self.active))
+        self.assertEqual(self.poll(poller), set())
+
+        woken = self.active[:2]
+        with db_session:
+            for room_id in woken:
+                Room[room_id].last_activity = datetime.utcnow()
+        self.assertEqual(self.poll(poller), set(woken))
+
+    def test_recheck(self) -> None:
+        """A room that was visited while it shut down is found again once it has shut down."""
+        from WebHostLib.autolauncher import RoomPoller
+
+        poller = RoomPoller()
+        self.poll(poller)
+        poller.recheck.update(self.active[:1])
+        self.assertEqual(self.poll(poller), set(self.active[:1]))
+        self.assertEqual(self.poll(poller), set())
+
+    def test_adapt_interval(self) -> None:
+        from WebHostLib.autolauncher import RoomPoller
+
+        poller = RoomPoller()
+        for _ in range(10):
+            poller.adapt_interval(False)
+        self.assertEqual(poller.interval, RoomPoller.max_interval)
+        poller.adapt_interval(True)
+        self.assertEqual(poller.interval, RoomPoller.min_interval)
+
+
+class TestRoomPlacements(unittest.TestCase):
+    def test_prune(self) -> None:
+        """Rooms that shut down are placed on the same hoster again, until they were shut down for too long."""
+        from WebHostLib.autolauncher import RoomPlacements
+
+        placements = RoomPlacements(timedelta(days=3))
+        rooms = [uuid4() for _ in range(3)]
+        hosters = [object() for _ in range(3)]
+        now = datetime.utcnow()
+        for i, room_id in enumerate(rooms):
+            placements.place(room_id, hosters[i])
+            placements.shut_down(room_id, now - timedelta(days=6 - 2 * i))
+        placements.get(rooms[0])  # started again
+        placements.prune(now)
+        self.assertEqual(placements.get(rooms[0]), hosters[0])
+        self.assertIsNone(placements.get(rooms[1]))
+        self.assertEqual(placements.get(rooms[2]), hosters[2])
@@ -0,0 +1,47 @@
+import typing
+import unittest
+
+
+class FakeRoom:
+    metrics = None
+
+    def __init__(self, room_id: int, save: typing.Optional[bytes] = None) -> None:
+        self.room_id = room_id
+        self.save = save
+        self.save_dirty = True
+
+    def dump_save(self) -> bytes:
+        if self.save is None:
+            raise ValueError("unpicklable save")
+        return self.save
+
+
+class TestRoomSaveScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_save(self) -> None:
+        """Rooms of a batch that failed to save are saved again with the next batch."""
+        from WebHostLib.customserver import RoomSaveScheduler
+
+        scheduler = RoomSaveScheduler(workers=1)
+        rooms = [FakeRoom(1), FakeRoom(2)]
+        for room in rooms:
+            scheduler.register(room)
+        with self.assertLogs(level="ERROR"):
+            await scheduler.save(rooms)
+        self.assertTrue(all(room.save_dirty for room in rooms))
+        self.assertFalse(scheduler._saving)
+
+    async def test_partially_failed_save(self) -> None:
+        """The other rooms of a batch are saved when one of them fails to dump, and only that one is retried."""
+        from WebHostLib.customserver import RoomSaveScheduler
+
+        written: typing.List[typing.Tuple[typing.List[int], typing.List[bytes]]] = []
+        scheduler = RoomSaveScheduler(workers=2)
+        scheduler.write = lambda room_ids, saves: written.append((room_ids, saves))
+        rooms = [FakeRoom(1, b"save 1"), FakeRoom(2), FakeRoom(3, b"save 3")]
+        for room in rooms:
+            scheduler.register(room)
+        with self.assertLogs(level="ERROR"):
+            await scheduler.save(rooms)
+        self.assertEqual(written, [([1, 3], [b"save 1", b"save 3"])])
+        self.assertEqual([room.save_dirty for room in rooms], [False, True, False])
+        self.assertFalse(scheduler._saving)
@@ -1,10 +1,9 @@
 from __future__ import annotations
-from itertools import count
 
 import os
 import sys
 import asyncio
-from typing import Tuple, List, Iterable, Dict
+from typing import Tuple, List, Iterable, Dict, Optional, Set
 
 from .world import BG3World
 from .items import ITEM_NAME_TO_ID, AP_ITEM_TO_BG3_ID
@@ -26,6 +25,17 @@ from CommonClient import gui_enabled, logger, get_base_parser, ClientCommandProc
 
 wg_logger = logging.getLogger("WG")
 bugged_locations = []
+watch_interval = 0.1
+"""Seconds between polls of the locations file. It is polled with os.stat and only read after it was modified."""
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Writes data to path through a temporary file, so the game never reads a partially written file."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
 
 class BG3ClientCommandProcessor(ClientCommandProcessor):
     def _cmd_resync(self):
@@ -48,6 +58,12 @@ class BG3Context(CommonContext):
         self.send_index: int = 0
         self.syncing = False
         self.awaiting_bridge = False
+        self.sent_bg3_items: List[str] = []
+        """BG3 ids of the items written to the sent items file so far, in the order of items_received."""
+        self.sent_level_ups: int = 0
+        self.locations_file_stat: Optional[Tuple[int, int]] = None
+        """(mtime, size) of the locations file when it was last read, to only reparse it after modification."""
+        self.handled_bg3_locations: Set[str] = set()
         # self.game_communication_path: files go in this path to pass data between us and the actual game
         game_options = BG3World.settings
 
@@ -87,6 +103,32 @@ class BG3Context(CommonContext):
         self.checked_locations.clear()
         self.server_locations.clear()
         self.finished_game = False
+        self.reset_locations_watch()
+
+    def reset_locations_watch(self):
+        """Makes game_watcher process every entry of the locations file again, e.g. to resend checks after a reconnect."""
+        self.locations_file_stat = None
+        self.handled_bg3_locations.clear()
+
+    def write_sent_items(self, resync: bool = False):
+        """
+        Translates items received since the last write and rewrites the sent items file if there were any.
+        Only the new items are translated, but the file is still written as a whole, as the game reads it as a list.
+        On a resync, items_received was replaced as a whole, so everything is translated and written again.
+        """
+        if resync or len(self.items_received) < len(self.sent_bg3_items):
+            self.sent_bg3_items.clear()
+            self.sent_level_ups = 0
+        new_items = self.items_received[len(self.sent_bg3_items):]
+        if not new_items and not resync:
+            return
+        for network_item in new_items:
+            item = AP_ITEM_TO_BG3_ID[self.item_names.lookup_in_game(network_item.item)]
+            if item == "LevelUp":
+                item = f"LevelUp<{self.sent_level_ups}>"
+                self.sent_level_ups += 1
+            self.sent_bg3_items.append(item)
+        write_json_atomic(os.path.join(self.se_bg3, self.comm_file_sent_items), self.sent_bg3_items)
 
     @property
     def endpoints(self):
@@ -127,18 +169,65 @@ class BG3Context(CommonContext):
             self.seed_name = args["seed_name"]
 
         if cmd in {"ReceivedItems"}:
-            received_items = [AP_ITEM_TO_BG3_ID[self.item_names.lookup_in_game(network_item.item)] for network_item in self.items_received]
-            counter = count()
-            received_items = [f"LevelUp<{next(counter)}>" if item == "LevelUp" else item for item in received_items]
-            path = os.path.join(self.se_bg3, self.comm_file_sent_items)
-            with open(path, 'w') as f:
-                json.dump(received_items, f)
+            self.write_sent_items(resync=args["index"] == 0)
 
         if cmd in {"RoomUpdate"}:
             if "checked_locations" in args:
                 path = os.path.join(self.se_bg3, self.comm_file_locations_checked)
                 #And then we did nothing with it
 
+def read_new_locations(ctx: BG3Context) -> List[str]:
+    """Returns the entries of the locations file not handled yet, or nothing if the file is unchanged since the last read."""
+    path = os.path.join(ctx.se_bg3, ctx.comm_file_locations_checked)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        with open(path, 'w') as f:
+            f.write("[]")
+        return []
+    file_stat = (stat.st_mtime_ns, stat.st_size)
+    if file_stat == ctx.locations_file_stat:
+        return []
+    with open(path, 'r') as f:
+        bg3_locations = json.load(f)
+    ctx.locations_file_stat = file_stat
+    return [loc for loc in bg3_locations if loc not in ctx.handled_bg3_locations]
+
+
+async def send_new_locations(ctx: BG3Context) -> bool:
+    """
+    Sends the checks of new entries of the locations file, and returns whether one of them is the victory.
+    The entries are only marked handled once their checks were sent, if sending fails they are read again.
+    """
+    # checks are only read once there is a slot to send them to
+    new_locations = read_new_locations(ctx) if ctx.slot is not None else []
+    sending = []
+    victory = False
+    for loc in new_locations:
+        if loc in BG3_LOCATION_TO_AP_LOCATIONS:
+            for apLoc in BG3_LOCATION_TO_AP_LOCATIONS[loc]:
+                if apLoc not in LOCATION_NAME_TO_ID:
+                    logger.error(f"BUG: Please tell BG3 channel that {apLoc} is a typo and needs fixing. This location may need a server send_location to fix this run.")
+                elif LOCATION_NAME_TO_ID[apLoc] not in ctx.checked_locations \
+                        and LOCATION_NAME_TO_ID[apLoc] not in sending:
+                    sending.append(LOCATION_NAME_TO_ID[apLoc])
+                if apLoc == "Victory_Halsin":
+                    victory = True
+        elif loc not in bugged_locations:
+            logger.error(f"Please tell BG3 channel about {loc}- it was not handled. This probably doesn't break anything, but it should be looked at.")
+            bugged_locations.append(loc)
+
+    if sending:
+        try:
+            await ctx.send_msgs([{"cmd": 'LocationChecks', "locations": sending}])
+        except Exception:
+            ctx.locations_file_stat = None
+            raise
+        ctx.checked_locations.update(sending)
+    ctx.handled_bg3_locations.update(new_locations)
+    return victory
+
+
 async def game_watcher(ctx: BG3Context):
     while not ctx.exit_event.is_set():
         try:
@@ -148,40 +237,15 @@ async def game_watcher(ctx: BG3Context):
                     #sync_msg.append({"cmd": "LocationChecks", "locations": list(ctx.locations_checked)})
                 await ctx.send_msgs(sync_msg)
                 ctx.syncing = False
-            sending = []
-            victory = False
-            bg3LocationsToSend = []
-
-            path = os.path.join(ctx.se_bg3, ctx.comm_file_locations_checked)
-            if (os.path.isfile(path)):
-                with open(path, 'r') as f:
-                    bg3LocationsToSend = json.load(f)
-            else:
-                with open(path, 'w') as f:
-                    f.write("[]")
-            for loc in bg3LocationsToSend:
-                if loc in BG3_LOCATION_TO_AP_LOCATIONS:
-                    for apLoc in BG3_LOCATION_TO_AP_LOCATIONS[loc]:
-                        if apLoc not in ctx.checked_locations and apLoc in LOCATION_NAME_TO_ID:
-                            sending = sending + [LOCATION_NAME_TO_ID[apLoc]]
-                            ctx.checked_locations.add(LOCATION_NAME_TO_ID[apLoc])
-                        if apLoc not in LOCATION_NAME_TO_ID:
-                            logger.error(f"BUG: Please tell BG3 channel that {apLoc} is a typo and needs fixing. This location may need a server send_location to fix this run.")
-                        if apLoc == "Victory_Halsin":
-                            victory = True
-                elif loc not in bugged_locations:
-                    logger.error(f"Please tell BG3 channel about {loc}- it was not handled. This probably doesn't break anything, but it should be looked at.")
-                    bugged_locations.append(loc)
-           
-            message = [{"cmd": 'LocationChecks', "locations": sending}]
-            await ctx.send_msgs(message)
+            victory = await send_new_locations(ctx)
             if not ctx.finished_game and victory:
                 await ctx.send_msgs([{"cmd": "StatusUpdate", "status": ClientStatus.CLIENT_GOAL}])
                 ctx.finished_game = True
-            await asyncio.sleep(3)
+            await asyncio.sleep(watch_interval)
 
         except Exception as err:
             logger.warn("Exception in communication thread, a check may not have been sent: " + str(err))
+            await asyncio.sleep(watch_interval)
 
 
 def print_error_and_close(msg):
@@ -4,7 +4,7 @@ from typing import TYPE_CHECKING
 
 from BaseClasses import CollectionState
 
-from ..generic.Rules import add_rule, set_rule
+from ..generic.Rules import Has, add_rule, set_rule
 
 if TYPE_CHECKING:
     from .world import BG3World
@@ -35,4 +35,4 @@ def set_completion_condition(world: BG3World) -> None:
     #    world.multiworld.completion_condition[world.player] = lambda state: state.has("Victory", world.player)
     #elif (world.options.goal == world.options.goal.option_kill_nether_brain):
     #    world.multiworld.completion_condition[world.player] = lambda state: state.has("Victory", world.player)
-    world.multiworld.completion_condition[world.player] = lambda state: state.has("Victory", world.player)
\ No newline at end of file
+    world.multiworld.completion_condition[world.player] = Has("Victory", world.player)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from NetUtils import NetworkItem
+
+from ..bg3_client import BG3Context, read_new_locations, send_new_locations
+from ..items import AP_ITEM_TO_BG3_ID, ITEM_NAME_TO_ID
+from ..locations import BG3_LOCATION_TO_AP_LOCATIONS, LOCATION_NAME_TO_ID
+
+
+class TestClientFiles(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for file_name in (BG3Context.comm_file_sent_items, BG3Context.comm_file_locations_checked):
+            with open(os.path.join(self.directory, file_name), "w") as f:
+                f.write("[]")
+        with mock.patch("os.path.expandvars", return_value=self.directory):
+            self.ctx = BG3Context(None, None)
+        self.ctx.update_data_package({"games": {BG3Context.game: {"item_name_to_id": ITEM_NAME_TO_ID,
+                                                                  "location_name_to_id": {}}}})
+
+    def receive(self, index: int, *names: str) -> None:
+        if index == 0:
+            self.ctx.items_received = []
+        self.ctx.items_received.extend(NetworkItem(ITEM_NAME_TO_ID[name], 0, 1, 0) for name in names)
+        self.ctx.on_package("ReceivedItems", {"index": index, "items": []})
+
+    def sent_items(self) -> list:
+        with open(os.path.join(self.directory, BG3Context.comm_file_sent_items)) as f:
+            return json.load(f)
+
+    def test_write_sent_items(self) -> None:
+        """Received items are appended to the sent items file, with level ups numbered."""
+        self.receive(0, "Level Up", "Boots of Speed")
+        self.receive(2, "Level Up")
+        self.assertEqual(self.sent_items(), ["LevelUp<0>", AP_ITEM_TO_BG3_ID["Boots of Speed"], "LevelUp<1>"])
+
+    def test_resync(self) -> None:
+        """A resync starting at index 0 rewrites the sent items file, even if as many items were received before."""
+        self.receive(0, "Level Up", "Boots of Speed")
+        self.receive(0, "Shadow Lantern", "Level Up")
+        self.assertEqual(self.sent_items(), [AP_ITEM_TO_BG3_ID["Shadow Lantern"], "LevelUp<0>"])
+        self.receive(0)
+        self.assertEqual(self.sent_items(), [])
+
+    def test_read_new_locations(self) -> None:
+        """Only entries not handled yet are returned, and only once the file changed."""
+        path = os.path.join(self.directory, BG3Context.comm_file_locations_checked)
+        with open(path, "w") as f:
+            json.dump(["A", "B"], f)
+        self.assertEqual(read_new_locations(self.ctx), ["A", "B"])
+        self.assertEqual(read_new_locations(self.ctx), [])
+        self.ctx.handled_bg3_locations.update(("A", "B"))
+        with open(path, "w") as f:
+            json.dump(["A", "B", "C"], f)
+        self.assertEqual(read_new_locations(self.ctx), ["C"])
+
+        self.ctx.reset_locations_watch()
+        self.assertEqual(read_new_locations(self.ctx), ["A", "B", "C"])
+
+    async def test_failed_send(self) -> None:
+        """Entries whose checks failed to send are read and sent again, and only marked handled once sent."""
+        bg3_location, ap_locations = next((bg3_location, ap_locations)
+                                          for bg3_location, ap_locations in BG3_LOCATION_TO_AP_LOCATIONS.items()
+                                          if ap_locations and all(loc in LOCATION_NAME_TO_ID for loc in ap_locations))
+        with open(os.path.join(self.directory, BG3Context.comm_file_locations_checked), "w") as f:
+            json.dump([bg3_location], f)
+        self.ctx.slot = 1
+        with mock.patch.object(self.ctx, "send_msgs", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                await send_new_locations(self.ctx)
+        self.assertFalse(self.ctx.handled_bg3_locations)
+        self.assertFalse(self.ctx.checked_locations)
+
+        with mock.patch.object(self.ctx, "send_msgs") as send_msgs:
+            await send_new_locations(self.ctx)
+            await send_new_locations(self.ctx)
+        location_ids = list(dict.fromkeys(LOCATION_NAME_TO_ID[loc] for loc in ap_locations))
+        send_msgs.assert_called_once_with([{"cmd": "LocationChecks", "locations": location_ids}])
+        self.assertEqual(self.ctx.handled_bg3_locations, {bg3_location})
+        self.assertEqual(self.ctx.checked_locations, set(location_ids))
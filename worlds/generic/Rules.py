@@ -1,4 +1,7 @@
+import abc
 import collections
+import dataclasses
+import functools
 import logging
 import typing
 
@@ -96,20 +99,291 @@ def exclusion_rules(multiworld: MultiWorld, player: int, exclude_locations: typi
                 logging.warning(f"Unable to exclude location {loc_name} in player {player}'s world.")
 
 
-def set_rule(spot: typing.Union["BaseClasses.Location", "BaseClasses.Entrance"], rule: CollectionRule):
-    spot.access_rule = rule
+@dataclasses.dataclass(frozen=True)
+class Rule(abc.ABC):
+    """
+    Declarative access rule. Rules can be passed to set_rule and add_rule, which compile them into flat evaluators, and
+    combined with & and |. Unlike a lambda, a rule can be inspected with get_rule.
+    """
+
+    def __call__(self, state: "BaseClasses.CollectionState") -> bool:
+        return self.evaluator(state)
+
+    @functools.cached_property
+    def evaluator(self) -> CollectionRule:
+        return compile_rule(self)
+
+    def item_dependencies(self, multiworld: MultiWorld) -> typing.Dict[int, typing.Set[str]]:
+        """Item names per player that this rule checks for."""
+        return {}
+
+    def region_dependencies(self) -> typing.Set[typing.Tuple[str, int]]:
+        """Names and players of the regions whose reachability this rule checks."""
+        return set()
+
+    @abc.abstractmethod
+    def _compile(self) -> CollectionRule:
+        """Returns a function evaluating this rule on a CollectionState."""
+
+    def __and__(self, other: "Rule") -> "Rule":
+        return And(self, other)
+
+    def __or__(self, other: "Rule") -> "Rule":
+        return Or(self, other)
+
+
+@dataclasses.dataclass(frozen=True)
+class Has(Rule):
+    item: str
+    player: int
+    count: int = 1
+
+    def item_dependencies(self, multiworld: MultiWorld) -> typing.Dict[int, typing.Set[str]]:
+        return {self.player: {self.item}}
+
+    def _compile(self) -> CollectionRule:
+        item, player, count = self.item, self.player, self.count
+        if count == 1:
+            return lambda state: state.prog_items[player][item] > 0
+        return lambda state: state.prog_items[player][item] >= count
+
+
+@dataclasses.dataclass(frozen=True)
+class HasAll(Rule):
+    items: typing.Tuple[str, ...]
+    player: int
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "items", tuple(self.items))
+
+    def item_dependencies(self, multiworld: MultiWorld) -> typing.Dict[int, typing.Set[str]]:
+        return {self.player: set(self.items)}
 
+    def _compile(self) -> CollectionRule:
+        items, player = self.items, self.player
+
+        def has_all(state: "BaseClasses.CollectionState") -> bool:
+            player_prog_items = state.prog_items[player]
+            for item in items:
+                if not player_prog_items[item]:
+                    return False
+            return True
+        return has_all
+
+
+@dataclasses.dataclass(frozen=True)
+class HasAny(Rule):
+    items: typing.Tuple[str, ...]
+    player: int
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "items", tuple(self.items))
+
+    def item_dependencies(self, multiworld: MultiWorld) -> typing.Dict[int, typing.Set[str]]:
+        return {self.player: set(self.items)}
+
+    def _compile(self) -> CollectionRule:
+        items, player = self.items, self.player
+
+        def has_any(state: "BaseClasses.CollectionState") -> bool:
+            player_prog_items = state.prog_items[player]
+            for item in items:
+                if player_prog_items[item]:
+                    return True
+            return False
+        return has_any
+
+
+@dataclasses.dataclass(frozen=True)
+class HasGroup(Rule):
+    """At least count items of an item name group, or count different ones of them if unique is set."""
+    group: str
+    player: int
+    count: int = 1
+    unique: bool = False
+
+    def item_dependencies(self, multiworld: MultiWorld) -> typing.Dict[int, typing.Set[str]]:
+        return {self.player: set(multiworld.worlds[self.player].item_name_groups[self.group])}
+
+    def _compile(self) -> CollectionRule:
+        group, player, count = self.group, self.player, self.count
+        if self.unique:
+            return lambda state: state.has_group_unique(group, player, count)
+        return lambda state: state.has_group(group, player, count)
+
+
+@dataclasses.dataclass(frozen=True)
+class CanReach(Rule):
+    """
+    Reachability of a Region, Location or Entrance. When used on an Entrance, remember to register an indirect condition
+    for the Region (or the parent Region of the Location or Entrance).
+    """
+    spot: str
+    player: int
+    resolution_hint: typing.Literal["Region", "Location", "Entrance"] = "Region"
 
-def add_rule(spot: typing.Union["BaseClasses.Location", "BaseClasses.Entrance"], rule: CollectionRule, combine="and"):
+    def region_dependencies(self) -> typing.Set[typing.Tuple[str, int]]:
+        return {(self.spot, self.player)} if self.resolution_hint == "Region" else set()
+
+    def _compile(self) -> CollectionRule:
+        spot, player = self.spot, self.player
+        if self.resolution_hint == "Location":
+            return lambda state: state.can_reach_location(spot, player)
+        if self.resolution_hint == "Entrance":
+            return lambda state: state.can_reach_entrance(spot, player)
+        return lambda state: state.can_reach_region(spot, player)
+
+
+@dataclasses.dataclass(frozen=True)
+class Custom(Rule):
+    """Wraps a plain function, for example to combine it with other rules."""
+    function: CollectionRule
+
+    def _compile(self) -> CollectionRule:
+        return self.function
+
+
+@dataclasses.dataclass(frozen=True, init=False)
+class _Combination(Rule):
+    rules: typing.Tuple[Rule, ...]
+
+    def __init__(self, *rules: Rule) -> None:
+        flattened: typing.List[Rule] = []
+        for rule in rules:
+            if type(rule) is type(self):
+                flattened.extend(rule.rules)  # type: ignore[attr-defined]
+            else:
+                flattened.append(rule)
+        object.__setattr__(self, "rules", tuple(flattened))
+
+    def item_dependencies(self, multiworld: MultiWorld) -> typing.Dict[int, typing.Set[str]]:
+        dependencies: typing.Dict[int, typing.Set[str]] = {}
+        for rule in self.rules:
+            for player, items in rule.item_dependencies(multiworld).items():
+                dependencies.setdefault(player, set()).update(items)
+        return dependencies
+
+    def region_dependencies(self) -> typing.Set[typing.Tuple[str, int]]:
+        return set().union(*(rule.region_dependencies() for rule in self.rules))
+
+    def _merged_rules(self, merged_type: typing.Type[typing.Union[HasAll, HasAny]]) -> typing.List[Rule]:
+        """Merges neighbouring single-count Has rules of the same player into one HasAll or HasAny."""
+        merged: typing.List[Rule] = []
+        for rule in self.rules:
+            if type(rule) is Has and rule.count == 1 and merged:
+                previous = merged[-1]
+                if type(previous) is Has and previous.count == 1 and previous.player == rule.player:
+                    merged[-1] = merged_type((previous.item, rule.item), rule.player)
+                    continue
+                if type(previous) is merged_type and previous.player == rule.player:
+                    merged[-1] = merged_type(previous.items + (rule.item,), rule.player)
+                    continue
+            merged.append(rule)
+        return merged
+
+
+class And(_Combination):
+    """All of the rules, evaluated in order."""
+
+    def _compile(self) -> CollectionRule:
+        evaluators = tuple(compile_rule(rule) for rule in self._merged_rules(HasAll))
+        if not evaluators:
+            return lambda state: True
+        if len(evaluators) == 1:
+            return evaluators[0]
+        if len(evaluators) == 2:
+            first, second = evaluators
+            return lambda state: first(state) and second(state)
+
+        def all_of(state: "BaseClasses.CollectionState") -> bool:
+            for evaluator in evaluators:
+                if not evaluator(state):
+                    return False
+            return True
+        return all_of
+
+
+class Or(_Combination):
+    """Any of the rules, evaluated in order."""
+
+    def _compile(self) -> CollectionRule:
+        evaluators = tuple(compile_rule(rule) for rule in self._merged_rules(HasAny))
+        if not evaluators:
+            return lambda state: False
+        if len(evaluators) == 1:
+            return evaluators[0]
+        if len(evaluators) == 2:
+            first, second = evaluators
+            return lambda state: first(state) or second(state)
+
+        def any_of(state: "BaseClasses.CollectionState") -> bool:
+            for evaluator in evaluators:
+                if evaluator(state):
+                    return True
+            return False
+        return any_of
+
+
+def compile_rule(rule: Rule) -> CollectionRule:
+    """
+    Compiles a rule into an evaluator function. Evaluators keep their rule as their `rule` attribute.
+    Single rules are cached, so equal rules share an evaluator. Combinations are compiled every time, as they are rarely
+    equal and their children come from the cache anyway, and wrapped functions are not cached, as they usually close
+    over their world, which the cache would keep alive.
+    """
+    if isinstance(rule, (Custom, _Combination)):
+        return _compile(rule)
+    return _compile_cached(rule)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_cached(rule: Rule) -> CollectionRule:
+    return _compile(rule)
+
+
+def _compile(rule: Rule) -> CollectionRule:
+    evaluator = rule._compile()
+    if isinstance(rule, Custom) or getattr(evaluator, "rule", None) is not None:
+        # don't tag functions that were not created for this rule
+        return evaluator
+    evaluator.rule = rule  # type: ignore[attr-defined]
+    return evaluator
+
+
+def get_rule(spot: typing.Union["BaseClasses.Location", "BaseClasses.Entrance"]) -> typing.Optional[Rule]:
+    """Returns the declarative rule of spot, or None if its access rule is a plain function."""
+    return _as_rule(spot.access_rule) if _is_declarative(spot.access_rule) else None
+
+
+def _is_declarative(rule: CollectionRule) -> bool:
+    return isinstance(rule, Rule) or getattr(rule, "rule", None) is not None
+
+
+def _as_rule(rule: typing.Union[Rule, CollectionRule]) -> Rule:
+    if isinstance(rule, Rule):
+        return rule
+    return getattr(rule, "rule", None) or Custom(rule)
+
+
+def set_rule(spot: typing.Union["BaseClasses.Location", "BaseClasses.Entrance"],
+             rule: typing.Union[Rule, CollectionRule]):
+    spot.access_rule = compile_rule(rule) if isinstance(rule, Rule) else rule
+
+
+def add_rule(spot: typing.Union["BaseClasses.Location", "BaseClasses.Entrance"],
+             rule: typing.Union[Rule, CollectionRule], combine="and"):
     old_rule = spot.access_rule
     # empty rule, replace instead of add
     if old_rule is Location.access_rule or old_rule is Entrance.access_rule:
-        spot.access_rule = rule if combine == "and" else old_rule
+        if combine == "and":
+            set_rule(spot, rule)
     else:
+        # combine into one flat rule, new rule first, instead of nesting another closure.
+        # The rule compiles itself when it is first evaluated, so a chain of add_rule calls is only compiled once.
         if combine == "and":
-            spot.access_rule = lambda state: rule(state) and old_rule(state)
+            spot.access_rule = And(_as_rule(rule), _as_rule(old_rule))
         else:
-            spot.access_rule = lambda state: rule(state) or old_rule(state)
+            spot.access_rule = Or(_as_rule(rule), _as_rule(old_rule))
 
 
 def forbid_item(location: "BaseClasses.Location", item: str, player: int):